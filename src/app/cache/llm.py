@@ -0,0 +1,79 @@
+"""
+Response cache for LLM calls.
+
+Keys combine the prompt template version, provider, model and temperature with
+a digest of the whitespace-normalized prompt, which embeds the resume text, so
+parsing the same text again through the same stage costs nothing. Every prompt
+template carries its own version string; bumping it, or purging it through the
+admin API, invalidates that template's entries in both tiers.
+"""
+
+import hashlib
+import re
+import sys
+from dataclasses import dataclass
+
+from app.cache.tiered import TwoTierCache
+from app.config.env_vars import EnvironmentVars
+from app.model.schema.cache.llm import LLMResponseCacheEntry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class CachedResponse:
+    prompt_version: str
+    provider: str
+    model: str
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+
+def _sizeof(value: CachedResponse) -> int:
+    return sys.getsizeof(value.text) + 200
+
+
+class LLMResponseCache(TwoTierCache[CachedResponse]):
+    entry_model = LLMResponseCacheEntry
+    label = "LLM cache"
+
+    def __init__(self, max_bytes: int, enabled: bool = True):
+        super().__init__(max_bytes, sizeof=_sizeof, enabled=enabled)
+
+    @staticmethod
+    def make_key(prompt_version: str, provider: str, model: str, temperature: float, prompt: str) -> str:
+        normalized = _WHITESPACE.sub(" ", prompt).strip()
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=20).hexdigest()
+        return f"{prompt_version}:{provider}:{model}:{temperature}:{digest}"
+
+    def _from_entry(self, entry: LLMResponseCacheEntry) -> CachedResponse:
+        return CachedResponse(
+            prompt_version=entry.prompt_version,
+            provider=entry.provider,
+            model=entry.model,
+            text=entry.text,
+            input_tokens=entry.input_tokens,
+            output_tokens=entry.output_tokens,
+        )
+
+    def _to_entry(self, key: str, value: CachedResponse) -> LLMResponseCacheEntry:
+        return LLMResponseCacheEntry(key=key, **value.__dict__)
+
+    def _updates(self, value: CachedResponse) -> dict:
+        return {LLMResponseCacheEntry.text: value.text}
+
+    async def purge(self, prompt_version: str) -> dict:
+        """Drop every entry produced by one prompt template version."""
+        prefix = f"{prompt_version}:"
+        memory = self._memory.discard(lambda key: key.startswith(prefix))
+        result = await LLMResponseCacheEntry.find(
+            LLMResponseCacheEntry.prompt_version == prompt_version
+        ).delete()
+        return {"memory": memory, "store": result.deleted_count if result else 0}
+
+
+llm_cache = LLMResponseCache(
+    max_bytes=EnvironmentVars.LLM_CACHE_MAX_BYTES,
+    enabled=EnvironmentVars.LLM_CACHE_ENABLED,
+)
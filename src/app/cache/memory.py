@@ -0,0 +1,58 @@
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+def default_sizeof(value: Any) -> int:
+    return sys.getsizeof(value)
+
+
+class ByteLRUCache:
+    """In-process LRU cache bounded by the approximate size of its values."""
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[Any], int] = default_sizeof):
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        self._entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            return
+        if key in self._entries:
+            self._bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, size)
+        self._bytes += size
+        while self._bytes > self._max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self.evictions += 1
+
+    def discard(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._entries if predicate(key)]
+        for key in keys:
+            self._bytes -= self._entries.pop(key)[1]
+        return len(keys)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,69 @@
+"""
+Per-section cache of structured extraction results.
+
+A resubmitted resume usually differs from the previous upload in one or two
+sections. Results are cached under a digest of each section's normalized text
+and the versions of every prompt that produced them, so only the sections that
+changed go back to the model and the rest are spliced in from here.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+from app.cache.tiered import TwoTierCache
+from app.config.env_vars import EnvironmentVars
+from app.model.schema.cache.section import SectionResultCacheEntry
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class CachedSection:
+    section: str
+    data: dict
+    # Versions of every prompt that produced data
+    prompt_versions: List[str] = field(default_factory=list)
+
+
+def _sizeof(value: CachedSection) -> int:
+    return len(json.dumps(value.data)) * 2 + 200
+
+
+class SectionResultCache(TwoTierCache[CachedSection]):
+    entry_model = SectionResultCacheEntry
+    label = "Section cache"
+
+    def __init__(self, max_bytes: int, enabled: bool = True):
+        super().__init__(max_bytes, sizeof=_sizeof, enabled=enabled)
+
+    @staticmethod
+    def make_key(prompt_versions: List[str], section: str, text: str) -> str:
+        normalized = _WHITESPACE.sub(" ", text).strip()
+        digest = hashlib.blake2b(normalized.encode("utf-8"), digest_size=20).hexdigest()
+        return f"{'+'.join(prompt_versions)}:{section}:{digest}"
+
+    def _from_entry(self, entry: SectionResultCacheEntry) -> CachedSection:
+        return CachedSection(section=entry.section, data=entry.data, prompt_versions=entry.prompt_versions)
+
+    def _to_entry(self, key: str, value: CachedSection) -> SectionResultCacheEntry:
+        return SectionResultCacheEntry(
+            key=key, prompt_versions=value.prompt_versions, section=value.section, data=value.data
+        )
+
+    def _updates(self, value: CachedSection) -> dict:
+        return {SectionResultCacheEntry.data: value.data}
+
+    async def purge(self, prompt_version: str) -> dict:
+        """Drop every section result that one prompt template version contributed to."""
+        memory = self._memory.discard(lambda key: prompt_version in key.split(":", 1)[0].split("+"))
+        result = await SectionResultCacheEntry.find({"prompt_versions": prompt_version}).delete()
+        return {"memory": memory, "store": result.deleted_count if result else 0}
+
+
+section_cache = SectionResultCache(
+    max_bytes=EnvironmentVars.SECTION_CACHE_MAX_BYTES,
+    enabled=EnvironmentVars.SECTION_CACHE_ENABLED,
+)
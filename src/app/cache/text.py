@@ -0,0 +1,55 @@
+"""
+Content-addressed cache for extracted resume text.
+
+Keys are derived from a digest of the raw upload plus the extractor version,
+so re-uploads of the same file skip parsing entirely and bumping the version
+invalidates every older entry. Lookups go through an in-process LRU bounded by
+bytes first, then a Mongo collection whose entries expire through a TTL index
+(see app.cache.tiered).
+"""
+
+import sys
+from dataclasses import dataclass
+from typing import List, Optional
+
+from app.cache.tiered import TwoTierCache
+from app.config.env_vars import EnvironmentVars
+from app.model.schema.cache.text import ExtractedTextCacheEntry
+
+
+@dataclass
+class CachedExtraction:
+    text: str
+    # Serialized layout blocks, only for structured extraction.
+    blocks: Optional[List[dict]] = None
+
+
+def _sizeof(value: CachedExtraction) -> int:
+    size = sys.getsizeof(value.text)
+    for block in value.blocks or []:
+        size += sys.getsizeof(block.get("text", "")) + 400
+    return size
+
+
+class ExtractedTextCache(TwoTierCache[CachedExtraction]):
+    entry_model = ExtractedTextCacheEntry
+    label = "Text cache"
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes, sizeof=_sizeof)
+
+    @staticmethod
+    def make_key(extractor_version: str, kind: str, digest: str) -> str:
+        return f"{extractor_version}:{kind}:{digest}"
+
+    def _from_entry(self, entry: ExtractedTextCacheEntry) -> CachedExtraction:
+        return CachedExtraction(text=entry.text, blocks=entry.blocks)
+
+    def _to_entry(self, key: str, value: CachedExtraction) -> ExtractedTextCacheEntry:
+        return ExtractedTextCacheEntry(key=key, text=value.text, blocks=value.blocks)
+
+    def _updates(self, value: CachedExtraction) -> dict:
+        return {ExtractedTextCacheEntry.text: value.text, ExtractedTextCacheEntry.blocks: value.blocks}
+
+
+text_cache = ExtractedTextCache(max_bytes=EnvironmentVars.TEXT_CACHE_MAX_BYTES)
@@ -0,0 +1,85 @@
+"""
+Two-tier cache shared by the text, LLM response and section result caches.
+
+Lookups go through an in-process LRU bounded by bytes first, then a Mongo
+collection whose entries expire through a TTL index; a store hit is copied
+back into memory. Store errors are counted and logged, never raised, so a
+database outage only costs cache hits. Subclasses name their entry document
+and convert between it and their payload.
+"""
+
+from typing import Any, Callable, Dict, Generic, Optional, Type, TypeVar
+
+from beanie import Document
+
+from app.cache.memory import ByteLRUCache
+
+V = TypeVar("V")
+
+
+class TwoTierCache(Generic[V]):
+    # Entry document of the store tier; it must have a unique "key" field.
+    entry_model: Type[Document]
+    # Used in log lines, e.g. "Text cache lookup failed".
+    label = "Cache"
+
+    def __init__(self, max_bytes: int, sizeof: Callable[[V], int], enabled: bool = True):
+        self.enabled = enabled
+        self._memory = ByteLRUCache(max_bytes, sizeof=sizeof)
+        self.store_hits = 0
+        self.store_errors = 0
+
+    def _from_entry(self, entry: Document) -> V:
+        raise NotImplementedError
+
+    def _to_entry(self, key: str, value: V) -> Document:
+        raise NotImplementedError
+
+    def _updates(self, value: V) -> Dict[Any, Any]:
+        """Fields to overwrite when the key is already stored"""
+        raise NotImplementedError
+
+    async def get(self, key: str) -> Optional[V]:
+        if not self.enabled:
+            return None
+        value = self._memory.get(key)
+        if value is not None:
+            return value
+
+        try:
+            entry = await self.entry_model.find_one(self.entry_model.key == key)
+        except Exception as e:
+            self.store_errors += 1
+            print(f"{self.label} lookup failed: {e}")
+            return None
+
+        if entry is None:
+            return None
+        self.store_hits += 1
+        value = self._from_entry(entry)
+        self._memory.put(key, value)
+        return value
+
+    async def put(self, key: str, value: V) -> None:
+        if not self.enabled:
+            return
+        self._memory.put(key, value)
+        try:
+            await self.entry_model.find_one(self.entry_model.key == key).upsert(
+                {"$set": self._updates(value)},
+                on_insert=self._to_entry(key, value),
+            )
+        except Exception as e:
+            self.store_errors += 1
+            print(f"{self.label} store failed: {e}")
+
+    def stats(self) -> dict:
+        memory = self._memory.stats()
+        return {
+            "enabled": self.enabled,
+            "memory": memory,
+            "store_hits": self.store_hits,
+            "store_errors": self.store_errors,
+            # A memory miss that the store also missed is a full miss.
+            "misses": memory["misses"] - self.store_hits,
+        }
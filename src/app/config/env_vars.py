@@ -12,3 +12,60 @@ class EnvironmentVars:
     API_PASSWORD = os.getenv("API_PASSWORD")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY") 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    EXTRACT_WORKERS = int(os.getenv("EXTRACT_WORKERS", "2"))
+    EXTRACT_CPU_SECONDS = int(os.getenv("EXTRACT_CPU_SECONDS", "20"))
+    UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+    UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR")
+    TEXT_CACHE_MAX_BYTES = int(os.getenv("TEXT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    TEXT_CACHE_TTL_SECONDS = int(os.getenv("TEXT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    EXTRACT_MAX_PAGES = int(os.getenv("EXTRACT_MAX_PAGES", "6"))
+    EXTRACT_MAX_CHARS = int(os.getenv("EXTRACT_MAX_CHARS", "48000"))
+    # Extract layout blocks and find section headers from typography.
+    STRUCTURED_EXTRACTION = os.getenv("STRUCTURED_EXTRACTION", "false").lower() == "true"
+    PROMPT_SECTION_SLICING = os.getenv("PROMPT_SECTION_SLICING", "true").lower() == "true"
+    OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    # Comma-separated Ollama servers sharing the local load; defaults to OLLAMA_HOST.
+    OLLAMA_HOSTS = [host.strip() for host in os.getenv("OLLAMA_HOSTS", OLLAMA_HOST).split(",") if host.strip()]
+    OLLAMA_PROBE_SECONDS = float(os.getenv("OLLAMA_PROBE_SECONDS", "5"))
+    OLLAMA_EJECT_AFTER = int(os.getenv("OLLAMA_EJECT_AFTER", "3"))
+    OLLAMA_READMIT_AFTER = int(os.getenv("OLLAMA_READMIT_AFTER", "2"))
+    OLLAMA_STRUCTURED_OUTPUT = os.getenv("OLLAMA_STRUCTURED_OUTPUT", "true").lower() == "true"
+    OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "-1")
+    OLLAMA_SECTION_FANOUT = os.getenv("OLLAMA_SECTION_FANOUT", "false").lower() == "true"
+    # Context for whole resumes, and for every generation when sections are fanned out.
+    OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "8192"))
+    OLLAMA_SECTION_NUM_CTX = int(os.getenv("OLLAMA_SECTION_NUM_CTX", "4096"))
+    # Per host; set to the Ollama servers' OLLAMA_NUM_PARALLEL.
+    OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", os.getenv("OLLAMA_CONCURRENCY", "2")))
+    OLLAMA_QUEUE_BUDGET_SECONDS = float(os.getenv("OLLAMA_QUEUE_BUDGET_SECONDS", "10"))
+    OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() == "true"
+    OLLAMA_WARMUP_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_WARMUP_TIMEOUT_SECONDS", "300"))
+    OLLAMA_RESIDENCY_CHECK_SECONDS = float(os.getenv("OLLAMA_RESIDENCY_CHECK_SECONDS", "30"))
+    GEMINI_CONCURRENCY = int(os.getenv("GEMINI_CONCURRENCY", "8"))
+    OPENAI_CONCURRENCY = int(os.getenv("OPENAI_CONCURRENCY", "8"))
+    OLLAMA_CONCURRENCY = int(os.getenv("OLLAMA_CONCURRENCY", "2"))
+    GEMINI_TIMEOUT_SECONDS = float(os.getenv("GEMINI_TIMEOUT_SECONDS", "60"))
+    OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "60"))
+    OLLAMA_TIMEOUT_SECONDS = float(os.getenv("OLLAMA_TIMEOUT_SECONDS", "30"))
+    BREAKER_WINDOW_SECONDS = float(os.getenv("BREAKER_WINDOW_SECONDS", "60"))
+    BREAKER_MIN_CALLS = int(os.getenv("BREAKER_MIN_CALLS", "10"))
+    BREAKER_ERROR_RATE = float(os.getenv("BREAKER_ERROR_RATE", "0.5"))
+    # A call is slow when it takes more than this fraction of the provider timeout.
+    BREAKER_SLOW_FRACTION = float(os.getenv("BREAKER_SLOW_FRACTION", "0.5"))
+    BREAKER_SLOW_RATE = float(os.getenv("BREAKER_SLOW_RATE", "0.8"))
+    BREAKER_OPEN_SECONDS = float(os.getenv("BREAKER_OPEN_SECONDS", "30"))
+    BREAKER_HALF_OPEN_CALLS = int(os.getenv("BREAKER_HALF_OPEN_CALLS", "1"))
+    RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+    RETRY_BASE_SECONDS = float(os.getenv("RETRY_BASE_SECONDS", "0.5"))
+    RETRY_MAX_SECONDS = float(os.getenv("RETRY_MAX_SECONDS", "8"))
+    # Shared by every LLM call made for one parse.
+    RETRY_BUDGET = int(os.getenv("RETRY_BUDGET", "4"))
+    RETRY_BUDGET_SECONDS = float(os.getenv("RETRY_BUDGET_SECONDS", "60"))
+    LLM_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_KEEPALIVE_CONNECTIONS", "16"))
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+    SECTION_CACHE_ENABLED = os.getenv("SECTION_CACHE_ENABLED", "true").lower() == "true"
+    SECTION_CACHE_MAX_BYTES = int(os.getenv("SECTION_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    SECTION_CACHE_TTL_SECONDS = int(os.getenv("SECTION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+    PIPELINE3_ROUTING_CONFIG = os.getenv("PIPELINE3_ROUTING_CONFIG")
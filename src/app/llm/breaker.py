@@ -0,0 +1,130 @@
+"""
+Circuit breakers for the LLM providers.
+
+Each provider's recent calls are kept for BREAKER_WINDOW_SECONDS. Once there
+are at least BREAKER_MIN_CALLS of them, the breaker opens when the share of
+failed calls reaches BREAKER_ERROR_RATE, or the share of slow calls (taking
+more than BREAKER_SLOW_FRACTION of their timeout; Ollama calls are never
+counted as slow) reaches BREAKER_SLOW_RATE. An open breaker rejects calls at
+once for BREAKER_OPEN_SECONDS, then lets BREAKER_HALF_OPEN_CALLS trial calls
+through: a trial that succeeds closes the breaker, one that fails opens it
+again.
+"""
+
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.config.env_vars import EnvironmentVars
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        name: str,
+        window_seconds: float = EnvironmentVars.BREAKER_WINDOW_SECONDS,
+        min_calls: int = EnvironmentVars.BREAKER_MIN_CALLS,
+        error_rate: float = EnvironmentVars.BREAKER_ERROR_RATE,
+        slow_rate: float = EnvironmentVars.BREAKER_SLOW_RATE,
+        open_seconds: float = EnvironmentVars.BREAKER_OPEN_SECONDS,
+        half_open_calls: int = EnvironmentVars.BREAKER_HALF_OPEN_CALLS,
+    ):
+        self.name = name
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = max(1, half_open_calls)
+        self.state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+        # (finished at, failed, slow) for calls in the window
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()
+        self.rejected = 0
+        self.transitions: Dict[str, int] = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+        self.last_reason: Optional[str] = None
+
+    def is_open(self) -> bool:
+        """True while calls would be rejected; does not use up a half-open trial"""
+        if self.state == OPEN:
+            return time.monotonic() < self._opened_at + self.open_seconds
+        if self.state == HALF_OPEN:
+            return self._trials >= self.half_open_calls
+        return False
+
+    def before_call(self):
+        """Admit a call or raise CircuitOpen"""
+        if self.state == OPEN and time.monotonic() >= self._opened_at + self.open_seconds:
+            self._move(HALF_OPEN, "cool-down over")
+        if self.state == CLOSED:
+            return
+        if self.state == HALF_OPEN and self._trials < self.half_open_calls:
+            self._trials += 1
+            return
+        self.rejected += 1
+        raise CircuitOpen(f"{self.name} circuit is {self.state}")
+
+    def cancelled(self):
+        """An admitted call was abandoned before it had a verdict"""
+        if self.state == HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+
+    def record(self, failed: bool, slow: bool):
+        if self.state == HALF_OPEN:
+            self._trials = max(0, self._trials - 1)
+            if failed or slow:
+                self._open("trial call " + ("failed" if failed else "was slow"))
+            else:
+                self._move(CLOSED, "trial call succeeded")
+            return
+        if self.state == OPEN:
+            # A call admitted before the breaker opened; it no longer matters.
+            return
+
+        now = time.monotonic()
+        self._calls.append((now, failed, slow))
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+        count = len(self._calls)
+        if count < self.min_calls:
+            return
+        failures = sum(1 for _, f, _ in self._calls if f) / count
+        slow_calls = sum(1 for _, _, s in self._calls if s) / count
+        if failures >= self.error_rate:
+            self._open(f"{failures:.0%} of {count} calls failed")
+        elif slow_calls >= self.slow_rate:
+            self._open(f"{slow_calls:.0%} of {count} calls were slow")
+
+    def _open(self, reason: str):
+        self._opened_at = time.monotonic()
+        self._move(OPEN, reason)
+
+    def _move(self, state: str, reason: str):
+        print(f"Circuit breaker {self.name}: {self.state} -> {state} ({reason})")
+        self.state = state
+        self.last_reason = reason
+        self.transitions[state] += 1
+        self._trials = 0
+        if state != OPEN:
+            self._calls.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        count = len(self._calls)
+        return {
+            "state": self.state,
+            "window_calls": count,
+            "window_error_rate": sum(1 for _, f, _ in self._calls if f) / count if count else 0.0,
+            "window_slow_rate": sum(1 for _, _, s in self._calls if s) / count if count else 0.0,
+            "rejected": self.rejected,
+            "transitions": dict(self.transitions),
+            "last_reason": self.last_reason,
+        }
@@ -0,0 +1,485 @@
+"""
+Async gateway for every LLM provider the pipelines call.
+
+Gemini, OpenAI and Ollama are all reached through non-blocking clients that
+are created once and reuse their keep-alive connections. Each provider has its
+own concurrency limit and per-call timeout, and every call returns the same
+LLMResult with the token counts the provider actually reported, so costs are
+computed from real usage instead of word-count estimates. Calls that name a
+prompt template version are answered from the response cache when possible.
+Ollama output can be streamed to a callback that decides when to stop it.
+A circuit breaker per provider (per server for Ollama, whose servers fail
+independently) turns calls away at once while the provider is failing or, for
+the cloud providers, too slow, instead of letting each one wait out its
+timeout.
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional
+
+import google.generativeai as genai
+import httpx
+import openai
+
+from app.cache.llm import CachedResponse, llm_cache
+from app.config.env_vars import EnvironmentVars
+from .breaker import CircuitBreaker, CircuitOpen
+
+GEMINI = "gemini"
+OPENAI = "openai"
+OLLAMA = "ollama"
+
+# USD per million (input, output) tokens. Local models are free.
+PRICING = {
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+
+class LLMError(Exception):
+    def __init__(
+        self, provider: str, message: str, status: Optional[int] = None, retry_after: Optional[float] = None
+    ):
+        super().__init__(f"{provider}: {message}")
+        self.provider = provider
+        # HTTP status of the provider's error response, if it sent one
+        self.status = status
+        # Seconds the provider asked us to wait before trying again
+        self.retry_after = retry_after
+
+
+class LLMTimeout(LLMError):
+    pass
+
+
+class LLMUnavailable(LLMError):
+    """The provider's circuit breaker is open"""
+
+
+class _HTTPStatusError(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class LLMResult:
+    text: str
+    provider: str
+    model: str
+    input_tokens: int
+    output_tokens: int
+    latency: float
+    # Served from the response cache; the token counts are the original call's.
+    cached: bool = False
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    @property
+    def cost(self) -> float:
+        if self.cached:
+            return 0.0
+        input_price, output_price = PRICING.get(self.model, (0.0, 0.0))
+        return (self.input_tokens * input_price + self.output_tokens * output_price) / 1_000_000
+
+
+@dataclass
+class ProviderLimits:
+    concurrency: int
+    timeout: float
+    # Calls taking more than this fraction of the timeout count as slow for the
+    # breaker; None when long calls are normal and only failures should count.
+    slow_fraction: Optional[float] = EnvironmentVars.BREAKER_SLOW_FRACTION
+
+
+class _ProviderStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.total_latency = 0.0
+        # Streamed generations the caller stopped before the model finished.
+        self.stopped_early = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "avg_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "stopped_early": self.stopped_early,
+        }
+
+
+class LLMGateway:
+    def __init__(self, limits: Dict[str, ProviderLimits]):
+        self._limits = limits
+        self._semaphores = {name: asyncio.Semaphore(limit.concurrency) for name, limit in limits.items()}
+        # Each Ollama server gets the Ollama concurrency limit to itself.
+        self._ollama_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._stats = {name: _ProviderStats() for name in limits}
+        # Ollama servers get their breakers on first use.
+        self._breakers = {name: CircuitBreaker(name) for name in limits if name != OLLAMA}
+        self._gemini_models: Dict[str, genai.GenerativeModel] = {}
+        self._openai: Optional[openai.AsyncOpenAI] = None
+        self._http: Optional[httpx.AsyncClient] = None
+
+    async def start(self):
+        if self._http is not None:
+            return
+        genai.configure(api_key=EnvironmentVars.GEMINI_API_KEY)
+        pool = httpx.Limits(
+            max_connections=max(limit.concurrency for limit in self._limits.values()) * 2,
+            max_keepalive_connections=EnvironmentVars.LLM_KEEPALIVE_CONNECTIONS,
+        )
+        self._http = httpx.AsyncClient(limits=pool, timeout=None)
+        # Retries are the caller's decision, not the SDK's.
+        self._openai = openai.AsyncOpenAI(
+            api_key=EnvironmentVars.OPENAI_API_KEY,
+            max_retries=0,
+            http_client=httpx.AsyncClient(limits=pool),
+        )
+
+    async def end(self):
+        if self._openai is not None:
+            await self._openai.close()
+            self._openai = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: stats.to_dict() for name, stats in self._stats.items()}
+
+    def breaker_stats(self) -> Dict[str, Any]:
+        return {name: breaker.stats() for name, breaker in self._breakers.items()}
+
+    def available(self, provider: str, host: Optional[str] = None) -> bool:
+        """False while the circuit of the provider (of the host, for Ollama) is open"""
+        breaker = self._breakers.get(_breaker_name(provider, host))
+        return breaker is None or not breaker.is_open()
+
+    def _breaker(self, provider: str, host: Optional[str]) -> CircuitBreaker:
+        name = _breaker_name(provider, host)
+        if name not in self._breakers:
+            self._breakers[name] = CircuitBreaker(name)
+        return self._breakers[name]
+
+    async def gemini(
+        self,
+        prompt: str,
+        model: str,
+        temperature: float,
+        max_output_tokens: int = 8192,
+        json_mode: bool = True,
+        prompt_version: Optional[str] = None,
+    ) -> LLMResult:
+        await self.start()
+        if model not in self._gemini_models:
+            self._gemini_models[model] = genai.GenerativeModel(model)
+        config = genai.types.GenerationConfig(
+            temperature=temperature,
+            max_output_tokens=max_output_tokens,
+            response_mime_type="application/json" if json_mode else None,
+        )
+
+        async def call():
+            response = await self._gemini_models[model].generate_content_async(
+                prompt,
+                generation_config=config,
+                request_options={"timeout": self._limits[GEMINI].timeout},
+            )
+            usage = response.usage_metadata
+            return response.text, usage.prompt_token_count, usage.candidates_token_count
+
+        return await self._cached(GEMINI, model, temperature, prompt, prompt_version, json_mode, call)
+
+    async def openai(
+        self,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int = 2000,
+        json_mode: bool = True,
+        prompt_version: Optional[str] = None,
+    ) -> LLMResult:
+        await self.start()
+        extra = {"response_format": {"type": "json_object"}} if json_mode else {}
+
+        async def call():
+            response = await self._openai.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                timeout=self._limits[OPENAI].timeout,
+                **extra,
+            )
+            usage = response.usage
+            return (
+                response.choices[0].message.content,
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0,
+            )
+
+        prompt = json.dumps(messages, ensure_ascii=False)
+        return await self._cached(OPENAI, model, temperature, prompt, prompt_version, json_mode, call)
+
+    async def ollama(
+        self,
+        prompt: str,
+        model: str,
+        options: Optional[Dict[str, Any]] = None,
+        host: str = EnvironmentVars.OLLAMA_HOST,
+        on_text: Optional[Callable[[str], bool]] = None,
+        format: Optional[Any] = None,
+        system: Optional[str] = None,
+        keep_alive: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> LLMResult:
+        """Generate with Ollama; with on_text, stream the output to it as it arrives.
+
+        format is "json" or a JSON Schema the output is constrained to. system
+        replaces the model's system prompt, and keep_alive is how long the model
+        stays loaded after this request ("-1" for as long as the server runs).
+
+        on_text returns True to stop the generation early, or raises to abort it.
+        Leaving the stream closes the connection, which cancels the generation
+        on the server and frees it for the next request.
+        """
+        await self.start()
+        request = {"model": model, "prompt": prompt, "options": options or {}}
+        if keep_alive is not None and keep_alive.lstrip("-").isdigit():
+            # Ollama reads strings as durations ("10m"); a bare count of seconds must be a number.
+            keep_alive = int(keep_alive)
+        for key, value in (("format", format), ("system", system), ("keep_alive", keep_alive)):
+            if value is not None:
+                request[key] = value
+        timeout = timeout or self._limits[OLLAMA].timeout
+
+        async def call():
+            response = await self._http.post(
+                f"{host}/api/generate",
+                json={**request, "stream": False},
+                timeout=timeout,
+            )
+            if response.status_code != 200:
+                raise _HTTPStatusError(f"Ollama error: {response.status_code}", response.status_code)
+            body = response.json()
+            return body.get("response", ""), body.get("prompt_eval_count", 0), body.get("eval_count", 0)
+
+        async def stream():
+            pieces = []
+            async with self._http.stream(
+                "POST",
+                f"{host}/api/generate",
+                json={**request, "stream": True},
+                timeout=timeout,
+            ) as response:
+                if response.status_code != 200:
+                    raise _HTTPStatusError(f"Ollama error: {response.status_code}", response.status_code)
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    body = json.loads(line)
+                    if body.get("error"):
+                        raise Exception(f"Ollama error: {body['error']}")
+                    pieces.append(body.get("response", ""))
+                    stop = on_text(pieces[-1])
+                    if body.get("done"):
+                        return "".join(pieces), body.get("prompt_eval_count", 0), body.get("eval_count", 0)
+                    if stop:
+                        break
+            # Stopped early: the final counts never arrive, and Ollama streams one token per line.
+            self._stats[OLLAMA].stopped_early += 1
+            return "".join(pieces), 0, len(pieces)
+
+        if host not in self._ollama_semaphores:
+            self._ollama_semaphores[host] = asyncio.Semaphore(self._limits[OLLAMA].concurrency)
+        return await self._call(
+            OLLAMA, model, stream if on_text else call, timeout, self._ollama_semaphores[host], host
+        )
+
+    async def ollama_loaded(self, host: str = EnvironmentVars.OLLAMA_HOST) -> List[str]:
+        """Names of the models currently loaded in an Ollama server's memory"""
+        await self.start()
+        response = await self._http.get(f"{host}/api/ps", timeout=self._limits[OLLAMA].timeout)
+        response.raise_for_status()
+        return [model["name"] for model in response.json().get("models", [])]
+
+    async def _cached(
+        self,
+        provider: str,
+        model: str,
+        temperature: float,
+        prompt: str,
+        prompt_version: Optional[str],
+        json_mode: bool,
+        call,
+    ) -> LLMResult:
+        if prompt_version is None:
+            return await self._call(provider, model, call)
+
+        start = time.perf_counter()
+        key = llm_cache.make_key(prompt_version, provider, model, temperature, prompt)
+        cached = await llm_cache.get(key)
+        if cached is not None:
+            return LLMResult(
+                text=cached.text,
+                provider=provider,
+                model=model,
+                input_tokens=cached.input_tokens,
+                output_tokens=cached.output_tokens,
+                latency=time.perf_counter() - start,
+                cached=True,
+            )
+
+        result = await self._call(provider, model, call)
+        # A truncated or malformed JSON answer would otherwise be replayed forever.
+        if not json_mode or _is_json(result.text):
+            await llm_cache.put(
+                key,
+                CachedResponse(
+                    prompt_version=prompt_version,
+                    provider=provider,
+                    model=model,
+                    text=result.text,
+                    input_tokens=result.input_tokens,
+                    output_tokens=result.output_tokens,
+                ),
+            )
+        return result
+
+    async def _call(
+        self,
+        provider: str,
+        model: str,
+        call,
+        timeout: Optional[float] = None,
+        semaphore: Optional[asyncio.Semaphore] = None,
+        host: Optional[str] = None,
+    ) -> LLMResult:
+        stats = self._stats[provider]
+        breaker = self._breaker(provider, host)
+        timeout = timeout or self._limits[provider].timeout
+        try:
+            breaker.before_call()
+        except CircuitOpen as e:
+            raise LLMUnavailable(provider, str(e))
+        try:
+            async with semaphore or self._semaphores[provider]:
+                stats.in_flight += 1
+                start = time.perf_counter()
+                try:
+                    # The SDK timeouts bound each HTTP request; this bounds the call
+                    # as a whole, including the Gemini client's own retries.
+                    text, input_tokens, output_tokens = await asyncio.wait_for(call(), timeout)
+                except asyncio.TimeoutError:
+                    stats.timeouts += 1
+                    breaker.record(failed=True, slow=True)
+                    raise LLMTimeout(provider, f"{model} did not respond within {timeout}s")
+                except (openai.APITimeoutError, httpx.TimeoutException) as e:
+                    stats.timeouts += 1
+                    breaker.record(failed=True, slow=True)
+                    raise LLMTimeout(provider, str(e))
+                except Exception as e:
+                    stats.errors += 1
+                    status = _status(e)
+                    breaker.record(failed=_is_provider_failure(status), slow=False)
+                    raise LLMError(provider, str(e), status, _retry_after(e)) from e
+                finally:
+                    stats.in_flight -= 1
+        except asyncio.CancelledError:
+            # A hedged call that lost the race says nothing about the provider.
+            breaker.cancelled()
+            raise
+
+        latency = time.perf_counter() - start
+        slow_fraction = self._limits[provider].slow_fraction
+        breaker.record(failed=False, slow=slow_fraction is not None and latency >= timeout * slow_fraction)
+        stats.calls += 1
+        stats.input_tokens += input_tokens or 0
+        stats.output_tokens += output_tokens or 0
+        stats.total_latency += latency
+        return LLMResult(
+            text=text or "",
+            provider=provider,
+            model=model,
+            input_tokens=input_tokens or 0,
+            output_tokens=output_tokens or 0,
+            latency=latency,
+        )
+
+
+def _breaker_name(provider: str, host: Optional[str]) -> str:
+    return f"{provider} {host}" if provider == OLLAMA and host else provider
+
+
+def _status(e: Exception) -> Optional[int]:
+    """HTTP status of a provider error: openai and Ollama errors carry status_code, Google API errors code"""
+    status = getattr(e, "status_code", None)
+    if status is None:
+        status = getattr(e, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def _retry_after(e: Exception) -> Optional[float]:
+    """The Retry-After of the error response (seconds or an HTTP date), if any"""
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if not headers:
+        return None
+    # OpenAI sends milliseconds alongside the standard header.
+    if headers.get("retry-after-ms"):
+        try:
+            return float(headers["retry-after-ms"]) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def _is_provider_failure(status: Optional[int]) -> bool:
+    """Whether an error says the provider is unwell, rather than that the request was bad"""
+    return status is None or status in (408, 429) or status >= 500
+
+
+def _is_json(text: str) -> bool:
+    try:
+        json.loads(text)
+    except ValueError:
+        return False
+    return True
+
+
+llm_gateway = LLMGateway(
+    {
+        GEMINI: ProviderLimits(EnvironmentVars.GEMINI_CONCURRENCY, EnvironmentVars.GEMINI_TIMEOUT_SECONDS),
+        OPENAI: ProviderLimits(EnvironmentVars.OPENAI_CONCURRENCY, EnvironmentVars.OPENAI_TIMEOUT_SECONDS),
+        # Streamed local generations routinely use most of their timeout.
+        OLLAMA: ProviderLimits(
+            EnvironmentVars.OLLAMA_CONCURRENCY, EnvironmentVars.OLLAMA_TIMEOUT_SECONDS, slow_fraction=None
+        ),
+    }
+)
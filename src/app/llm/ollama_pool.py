@@ -0,0 +1,203 @@
+"""
+Pool of Ollama servers for the local model.
+
+Each generation goes to the healthy host with the fewest requests in flight.
+A host is ejected after OLLAMA_EJECT_AFTER consecutive failures, counting
+both failed health probes and requests that could not connect or got a 5xx
+answer. Timeouts are left to the host's circuit breaker, and errors caused
+by the request itself (a 4xx, unusable output) say nothing about the host.
+It is admitted again after
+OLLAMA_READMIT_AFTER probes in a row succeed. Probes run in the background
+every OLLAMA_PROBE_SECONDS against every host, ejected or not. Hosts whose
+circuit breaker is open are passed over too; a call its breaker turned away
+never reached the host, so it does not count as a failure.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+import httpx
+
+from app.config.env_vars import EnvironmentVars
+from .gateway import OLLAMA, LLMError, LLMTimeout, LLMUnavailable, llm_gateway
+
+T = TypeVar("T")
+
+PROBE_TIMEOUT_SECONDS = 2.0
+
+
+class NoHealthyOllamaHost(Exception):
+    pass
+
+
+class OllamaHost:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.healthy = True
+        self.outstanding = 0
+        self.picked = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.consecutive_failures = 0
+        self.consecutive_probe_successes = 0
+        self.ejections = 0
+        self.probe_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "errors": self.errors,
+            "avg_latency": self.total_latency / self.requests if self.requests else 0.0,
+            "max_latency": self.max_latency,
+            "probe_latency": self.probe_latency,
+            "ejections": self.ejections,
+            "last_error": self.last_error,
+        }
+
+
+class OllamaHostPool:
+    def __init__(
+        self,
+        urls: List[str],
+        probe_seconds: float,
+        eject_after: int,
+        readmit_after: int,
+        admits: Callable[[str], bool] = lambda url: True,
+    ):
+        self.hosts = [OllamaHost(url) for url in urls]
+        # Whether a host's circuit breaker would let a call through
+        self._admits = admits
+        self.probe_seconds = probe_seconds
+        self.eject_after = max(1, eject_after)
+        self.readmit_after = max(1, readmit_after)
+        self._http: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def urls(self) -> List[str]:
+        return [host.url for host in self.hosts]
+
+    def healthy_count(self) -> int:
+        return sum(1 for host in self.hosts if host.healthy)
+
+    def usable_count(self) -> int:
+        """Healthy hosts whose circuit is not open"""
+        return len(self._usable())
+
+    def available(self) -> bool:
+        return bool(self._usable())
+
+    def _usable(self) -> List[OllamaHost]:
+        return [host for host in self.hosts if host.healthy and self._admits(host.url)]
+
+    async def start(self):
+        if self._task is None:
+            self._http = httpx.AsyncClient(timeout=PROBE_TIMEOUT_SECONDS)
+            self._task = asyncio.create_task(self._probe_forever())
+
+    async def end(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def pick(self) -> OllamaHost:
+        """The usable host with the fewest requests in flight, rotating among ties"""
+        usable = self._usable()
+        if not usable:
+            raise NoHealthyOllamaHost(f"all {len(self.hosts)} Ollama hosts are ejected or have open circuits")
+        host = min(usable, key=lambda h: (h.outstanding, h.picked))
+        host.picked += 1
+        return host
+
+    async def run(self, call: Callable[[str], Awaitable[T]]) -> T:
+        """Run call(host_url) on the least busy healthy host"""
+        host = self.pick()
+        host.outstanding += 1
+        start = time.perf_counter()
+        try:
+            result = await call(host.url)
+        except (asyncio.CancelledError, LLMUnavailable):
+            raise
+        except Exception as e:
+            host.errors += 1
+            if _is_host_failure(e):
+                self._failed(host, str(e))
+            else:
+                host.last_error = str(e)
+            raise
+        else:
+            latency = time.perf_counter() - start
+            host.requests += 1
+            host.total_latency += latency
+            host.max_latency = max(host.max_latency, latency)
+            host.consecutive_failures = 0
+            return result
+        finally:
+            host.outstanding -= 1
+
+    def _failed(self, host: OllamaHost, error: str):
+        host.last_error = error
+        host.consecutive_failures += 1
+        host.consecutive_probe_successes = 0
+        if host.healthy and host.consecutive_failures >= self.eject_after:
+            host.healthy = False
+            host.ejections += 1
+            print(f"Ejected Ollama host {host.url} after {host.consecutive_failures} failures: {error}")
+
+    async def probe(self, host: OllamaHost):
+        start = time.perf_counter()
+        try:
+            response = await self._http.get(f"{host.url}/api/version")
+            response.raise_for_status()
+        except Exception as e:
+            self._failed(host, f"probe failed: {e!r}")
+            return
+        host.probe_latency = time.perf_counter() - start
+        if not host.healthy:
+            host.consecutive_probe_successes += 1
+            if host.consecutive_probe_successes >= self.readmit_after:
+                host.healthy = True
+                host.consecutive_failures = 0
+                host.consecutive_probe_successes = 0
+                print(f"Readmitted Ollama host {host.url}")
+
+    async def _probe_forever(self):
+        while True:
+            await asyncio.gather(*[self.probe(host) for host in self.hosts])
+            await asyncio.sleep(self.probe_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {host.url: host.to_dict() for host in self.hosts}
+
+
+def _is_host_failure(e: Exception) -> bool:
+    """Whether a failed request says the host is down, rather than that the request was bad or slow"""
+    if isinstance(e, LLMTimeout):
+        return False
+    if isinstance(e, LLMError):
+        if e.status is not None:
+            return e.status >= 500
+        e = e.__cause__
+    return isinstance(e, httpx.TransportError)
+
+
+ollama_pool = OllamaHostPool(
+    EnvironmentVars.OLLAMA_HOSTS,
+    probe_seconds=EnvironmentVars.OLLAMA_PROBE_SECONDS,
+    eject_after=EnvironmentVars.OLLAMA_EJECT_AFTER,
+    readmit_after=EnvironmentVars.OLLAMA_READMIT_AFTER,
+    admits=lambda url: llm_gateway.available(OLLAMA, url),
+)
@@ -0,0 +1,135 @@
+"""
+Retries for cloud LLM calls.
+
+A call is retried when the provider answered 408, 429 or a 5xx, or the
+connection failed before it answered. The wait is the provider's Retry-After
+when it sent one, otherwise decorrelated jitter: a random delay between
+RETRY_BASE_SECONDS and three times the previous delay, capped at
+RETRY_MAX_SECONDS. Each parse runs inside retry_budget(), which allows
+RETRY_BUDGET retries across all of its calls and sets a deadline
+RETRY_BUDGET_SECONDS away; a retry that would overrun either is not made.
+Timeouts and open circuits are not retried: a timed-out call has already used
+up its share of the deadline, and an open circuit would turn the retry away.
+"""
+
+import asyncio
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import httpx
+import openai
+
+from app.config.env_vars import EnvironmentVars
+from .gateway import LLMError, LLMTimeout, LLMUnavailable
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+@dataclass
+class RetryBudget:
+    retries: int
+    # time.monotonic() after which no retry starts
+    deadline: float
+
+    def allows(self, wait: float) -> bool:
+        return self.retries > 0 and time.monotonic() + wait < self.deadline
+
+
+_budget: ContextVar[Optional[RetryBudget]] = ContextVar("retry_budget", default=None)
+
+
+@contextmanager
+def retry_budget(
+    retries: int = EnvironmentVars.RETRY_BUDGET, seconds: float = EnvironmentVars.RETRY_BUDGET_SECONDS
+):
+    """Share one retry budget between every call made inside the block, including in tasks it starts"""
+    token = _budget.set(RetryBudget(retries, time.monotonic() + seconds))
+    try:
+        yield
+    finally:
+        _budget.reset(token)
+
+
+class _StageStats:
+    def __init__(self):
+        self.calls = 0
+        self.retries = 0
+        # Calls that succeeded after at least one retry
+        self.recovered = 0
+        # Calls that failed with a retryable error and were not retried further
+        self.gave_up = 0
+        self.statuses: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "recovered": self.recovered,
+            "gave_up": self.gave_up,
+            "retried_statuses": dict(self.statuses),
+        }
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts: int, base_seconds: float, max_seconds: float):
+        self.max_attempts = max(1, max_attempts)
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+        self._stats: Dict[str, _StageStats] = {}
+
+    def retryable(self, e: LLMError) -> bool:
+        if isinstance(e, (LLMTimeout, LLMUnavailable)):
+            return False
+        if e.status is not None:
+            return e.status in RETRYABLE_STATUSES
+        return isinstance(e.__cause__, (openai.APIConnectionError, httpx.TransportError))
+
+    def _backoff(self, previous: float) -> float:
+        return min(self.max_seconds, random.uniform(self.base_seconds, previous * 3))
+
+    async def run(self, stage: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Await call(), retrying transient provider errors; stage names the counters"""
+        stats = self._stats.setdefault(stage, _StageStats())
+        stats.calls += 1
+        attempt = 1
+        delay = self.base_seconds
+        while True:
+            try:
+                result = await call()
+            except LLMError as e:
+                if not self.retryable(e):
+                    raise
+                delay = self._backoff(delay)
+                wait = e.retry_after if e.retry_after is not None else delay
+                budget = _budget.get()
+                if attempt >= self.max_attempts or (budget is not None and not budget.allows(wait)):
+                    stats.gave_up += 1
+                    raise
+                if budget is not None:
+                    budget.retries -= 1
+                stats.retries += 1
+                status = str(e.status) if e.status is not None else "connection"
+                stats.statuses[status] = stats.statuses.get(status, 0) + 1
+                attempt += 1
+                print(f"Retrying {stage} in {wait:.1f}s (attempt {attempt}): {e}")
+                await asyncio.sleep(wait)
+            else:
+                if attempt > 1:
+                    stats.recovered += 1
+                return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {stage: stats.to_dict() for stage, stats in self._stats.items()}
+
+
+retry_policy = RetryPolicy(
+    max_attempts=EnvironmentVars.RETRY_MAX_ATTEMPTS,
+    base_seconds=EnvironmentVars.RETRY_BASE_SECONDS,
+    max_seconds=EnvironmentVars.RETRY_MAX_SECONDS,
+)
@@ -7,23 +7,45 @@ from fastapi.responses import JSONResponse
 
 from app.config.dependency import database
 from app.config.security import api_authenticate
-from app.router import router as main_router
+from app.llm.gateway import llm_gateway
+from app.llm.ollama_pool import ollama_pool
+from app.parser.extract_pool import extraction_pool
+from app.router import pipeline3_parser, router as main_router
+from app.router.admin import router as admin_router
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await database.start()
+    await extraction_pool.start()
+    await llm_gateway.start()
+    await ollama_pool.start()
+    # Loads the local model in the background; /ready reports when it is done.
+    await pipeline3_parser.keeper.start()
     yield
+    await pipeline3_parser.keeper.end()
+    await ollama_pool.end()
+    await llm_gateway.end()
+    await extraction_pool.end()
     await database.end()
 
 
 router = APIRouter(prefix="/api/v1", dependencies=[Depends(api_authenticate)])
 router.include_router(main_router)
+router.include_router(admin_router)
 
 app = FastAPI(lifespan=lifespan, redirect_slashes=False)
 app.include_router(router)
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe; unauthenticated, 503 until the local model is loaded"""
+    if not pipeline3_parser.keeper.ready:
+        return JSONResponse(status_code=503, content={"ready": False})
+    return {"ready": True}
+
+
 @app.exception_handler(Exception)
 async def internal_server_error_handler(request: Request, e: Exception):
     return JSONResponse(
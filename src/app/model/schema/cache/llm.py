@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+
+import pymongo
+from beanie import Document, Indexed
+from pydantic import Field
+
+from app.config.env_vars import EnvironmentVars
+
+
+class LLMResponseCacheEntry(Document):
+    # "<prompt version>:<provider>:<model>:<temperature>:<prompt digest>"
+    key: Indexed(str, unique=True)
+    prompt_version: Indexed(str)
+    provider: str
+    model: str
+    text: str
+    input_tokens: int = 0
+    output_tokens: int = 0
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "llm_response_cache"
+        indexes = [
+            pymongo.IndexModel(
+                [("created_at", pymongo.ASCENDING)],
+                expireAfterSeconds=EnvironmentVars.LLM_CACHE_TTL_SECONDS,
+            ),
+        ]
@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+
+import pymongo
+from beanie import Document, Indexed
+from pydantic import Field
+
+from app.config.env_vars import EnvironmentVars
+
+
+class SectionResultCacheEntry(Document):
+    # "<prompt versions joined by +>:<section name>:<section text digest>"
+    key: Indexed(str, unique=True)
+    prompt_versions: list[str]
+    section: str
+    data: dict
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "section_result_cache"
+        indexes = [
+            "prompt_versions",
+            pymongo.IndexModel(
+                [("created_at", pymongo.ASCENDING)],
+                expireAfterSeconds=EnvironmentVars.SECTION_CACHE_TTL_SECONDS,
+            ),
+        ]
@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+import pymongo
+from beanie import Document, Indexed
+from pydantic import Field
+
+from app.config.env_vars import EnvironmentVars
+
+
+class ExtractedTextCacheEntry(Document):
+    # "<extractor version>:<kind>:<content digest>"
+    key: Indexed(str, unique=True)
+    text: str
+    blocks: Optional[list[dict]] = None
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+
+    class Settings:
+        name = "extracted_text_cache"
+        indexes = [
+            pymongo.IndexModel(
+                [("created_at", pymongo.ASCENDING)],
+                expireAfterSeconds=EnvironmentVars.TEXT_CACHE_TTL_SECONDS,
+            ),
+        ]
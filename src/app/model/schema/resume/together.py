@@ -1,3 +1,6 @@
+from typing import Optional
+
+import pymongo
 from beanie import Document
 from pydantic import Field
 
@@ -22,3 +25,23 @@ class Resume(Document):
 
     # Include additional written paragraphs that are not associated with any other information field.
     paragraphs: list[str] = Field(default_factory=list)
+
+    # Which upload and parser produced this document; identical uploads reuse it.
+    content_hash: Optional[str] = None
+    pipeline: Optional[str] = None
+    pipeline_version: Optional[str] = None
+
+    class Settings:
+        indexes = [
+            pymongo.IndexModel(
+                [
+                    ("content_hash", pymongo.ASCENDING),
+                    ("pipeline", pymongo.ASCENDING),
+                    ("pipeline_version", pymongo.ASCENDING),
+                ],
+                name="content_hash_pipeline_version",
+                unique=True,
+                # Documents stored before hashing have no content_hash.
+                partialFilterExpression={"content_hash": {"$type": "string"}},
+            ),
+        ]
@@ -1,3 +1,6 @@
+from app.model.schema.cache.llm import LLMResponseCacheEntry
+from app.model.schema.cache.section import SectionResultCacheEntry
+from app.model.schema.cache.text import ExtractedTextCacheEntry
 from app.model.schema.resume.together import Resume
 
-DOCUMENTS = [Resume]
+DOCUMENTS = [Resume, ExtractedTextCacheEntry, LLMResponseCacheEntry, SectionResultCacheEntry]
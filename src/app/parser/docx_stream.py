@@ -0,0 +1,271 @@
+"""
+Streaming DOCX text extractor.
+
+Reads ``word/document.xml`` and the header/footer parts straight out of the
+ZIP package with an incremental XML parser instead of building the python-docx
+object model. Paragraphs, table rows (cells joined with " | "), and text boxes
+are emitted in reading order; header lines come first because many templates
+keep contact details there. Run formatting (bold, size) and paragraph styles
+are kept on each TextBlock for structured extraction.
+
+Run as a script to benchmark against python-docx:
+
+    python -m app.parser.docx_stream resume1.docx resume2.docx ...
+"""
+
+import re
+import zipfile
+from dataclasses import dataclass, field
+from typing import IO, Iterator, List, Optional
+from xml.etree.ElementTree import iterparse
+
+from app.parser.layout import TextBlock
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC = "{http://schemas.openxmlformats.org/markup-compatibility/2006}"
+
+P = W + "p"
+PPR = W + "pPr"
+PSTYLE = W + "pStyle"
+R = W + "r"
+B = W + "b"
+SZ = W + "sz"
+T = W + "t"
+TAB = W + "tab"
+BR = W + "br"
+CR = W + "cr"
+RENDERED_PAGE_BREAK = W + "lastRenderedPageBreak"
+TC = W + "tc"
+TR = W + "tr"
+VAL = W + "val"
+TYPE = W + "type"
+# Text boxes are written twice: a DrawingML choice and a VML fallback.
+FALLBACK = MC + "Fallback"
+
+DOCUMENT_PART = "word/document.xml"
+HEADER_PART = re.compile(r"^word/header\d*\.xml$")
+FOOTER_PART = re.compile(r"^word/footer\d*\.xml$")
+
+
+def extract_docx_text(source) -> str:
+    """Extract text from a DOCX path or seekable binary stream."""
+    return "\n".join(block.text for block in iter_docx_blocks(source))
+
+
+def extract_docx_blocks(source) -> List[TextBlock]:
+    return list(iter_docx_blocks(source))
+
+
+def iter_docx_blocks(source) -> Iterator[TextBlock]:
+    with zipfile.ZipFile(source) as package:
+        names = package.namelist()
+        headers = sorted(name for name in names if HEADER_PART.match(name))
+        footers = sorted(name for name in names if FOOTER_PART.match(name))
+
+        # First-page, even and default headers usually repeat the same lines.
+        seen = set()
+        for name in headers:
+            for block in _iter_part(package, name, _PageCounter()):
+                if block.text not in seen:
+                    seen.add(block.text)
+                    yield block
+
+        pages = _PageCounter()
+        yield from _iter_part(package, DOCUMENT_PART, pages)
+
+        seen = set()
+        for name in footers:
+            for block in _iter_part(package, name, _PageCounter(pages.page)):
+                if block.text not in seen:
+                    seen.add(block.text)
+                    yield block
+
+
+def _iter_part(package: zipfile.ZipFile, name: str, pages: "_PageCounter") -> Iterator[TextBlock]:
+    with package.open(name) as stream:
+        yield from _iter_blocks(stream, pages)
+
+
+@dataclass
+class _PageCounter:
+    page: int = 1
+    # Word writes a lastRenderedPageBreak right after an explicit page break
+    # too; this keeps the pair from counting as two pages.
+    explicit_break_pending: bool = False
+
+    def explicit_break(self):
+        self.page += 1
+        self.explicit_break_pending = True
+
+    def rendered_break(self):
+        if self.explicit_break_pending:
+            self.explicit_break_pending = False
+        else:
+            self.page += 1
+
+
+@dataclass
+class _Run:
+    parts: List[str] = field(default_factory=list)
+    bold: bool = False
+    half_points: Optional[int] = None
+
+
+@dataclass
+class _Paragraph:
+    page: int
+    runs: List[_Run] = field(default_factory=list)
+    style: Optional[str] = None
+
+    def to_block(self) -> Optional[TextBlock]:
+        text = "".join(part for run in self.runs for part in run.parts).strip()
+        if not text:
+            return None
+        text_runs = [run for run in self.runs if "".join(run.parts).strip()]
+        sizes = [run.half_points / 2 for run in text_runs if run.half_points]
+        return TextBlock(
+            text=text,
+            page=self.page,
+            font_size=max(sizes) if sizes else None,
+            bold=all(run.bold for run in text_runs),
+            style=self.style,
+        )
+
+
+def _row_block(blocks: List[TextBlock]) -> Optional[TextBlock]:
+    cells = [block for block in blocks if block.text]
+    if not cells:
+        return None
+    sizes = [block.font_size for block in cells if block.font_size]
+    return TextBlock(
+        text=" | ".join(block.text for block in cells),
+        page=cells[0].page,
+        font_size=max(sizes) if sizes else None,
+        bold=all(block.bold for block in cells),
+    )
+
+
+def _cell_block(blocks: List[TextBlock]) -> TextBlock:
+    if not blocks:
+        return TextBlock(text="", page=0)
+    sizes = [block.font_size for block in blocks if block.font_size]
+    return TextBlock(
+        text=" ".join(block.text for block in blocks),
+        page=blocks[0].page,
+        font_size=max(sizes) if sizes else None,
+        bold=all(block.bold for block in blocks),
+    )
+
+
+def _iter_blocks(stream: IO[bytes], pages: _PageCounter) -> Iterator[TextBlock]:
+    paragraphs: List[_Paragraph] = []
+    runs: List[_Run] = []
+    cells: List[List[TextBlock]] = []  # finished blocks of each open table cell
+    rows: List[List[TextBlock]] = []  # finished cells of each open table row
+    ppr_depth = 0
+    skip_depth = 0
+
+    for event, elem in iterparse(stream, events=("start", "end")):
+        tag = elem.tag
+
+        if tag == FALLBACK:
+            skip_depth += 1 if event == "start" else -1
+            continue
+        if skip_depth:
+            continue
+
+        if event == "start":
+            if tag == P:
+                paragraphs.append(_Paragraph(page=pages.page))
+            elif tag == PPR:
+                ppr_depth += 1
+            elif tag == R:
+                runs.append(_Run())
+            elif tag == TC:
+                cells.append([])
+            elif tag == TR:
+                rows.append([])
+            continue
+
+        if tag == PPR:
+            ppr_depth -= 1
+        elif tag == PSTYLE and paragraphs:
+            paragraphs[-1].style = elem.get(VAL)
+        elif ppr_depth:
+            # Paragraph mark formatting, not the formatting of any visible text.
+            continue
+        elif tag == R:
+            run = runs.pop()
+            if paragraphs:
+                paragraphs[-1].runs.append(run)
+        elif runs and tag == B:
+            runs[-1].bold = elem.get(VAL, "true") not in ("0", "false", "off")
+        elif runs and tag == SZ:
+            value = elem.get(VAL)
+            runs[-1].half_points = int(value) if value and value.isdigit() else None
+        elif runs and tag == T:
+            runs[-1].parts.append(elem.text or "")
+            if elem.text:
+                pages.explicit_break_pending = False
+        elif runs and tag == TAB:
+            # Only tabs inside runs; w:tab also appears in tab stop definitions.
+            runs[-1].parts.append("\t")
+        elif runs and tag == CR:
+            runs[-1].parts.append("\n")
+        elif runs and tag == BR:
+            if elem.get(TYPE) == "page":
+                pages.explicit_break()
+            else:
+                runs[-1].parts.append("\n")
+        elif tag == RENDERED_PAGE_BREAK:
+            pages.rendered_break()
+        elif tag == P:
+            block = paragraphs.pop().to_block()
+            if block:
+                if cells:
+                    cells[-1].append(block)
+                else:
+                    yield block
+            elem.clear()
+        elif tag == TC:
+            cell = _cell_block(cells.pop())
+            if rows:
+                rows[-1].append(cell)
+            elem.clear()
+        elif tag == TR:
+            block = _row_block(rows.pop())
+            if block:
+                if cells:
+                    cells[-1].append(block)
+                else:
+                    yield block
+            elem.clear()
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from docx import Document
+
+    def _python_docx_text(path: str) -> str:
+        doc = Document(path)
+        return "\n".join(p.text for p in doc.paragraphs if p.text.strip())
+
+    def _bench(fn, path: str, repeat: int = 5):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            text = fn(path)
+        return (time.perf_counter() - start) / repeat * 1000, len(text)
+
+    totals = {"python-docx": 0.0, "stream": 0.0}
+    print(f"{'file':40} {'python-docx ms':>15} {'chars':>7} {'stream ms':>10} {'chars':>7}")
+    for path in sys.argv[1:]:
+        docx_ms, docx_chars = _bench(_python_docx_text, path)
+        stream_ms, stream_chars = _bench(extract_docx_text, path)
+        totals["python-docx"] += docx_ms
+        totals["stream"] += stream_ms
+        print(f"{path[-40:]:40} {docx_ms:15.2f} {docx_chars:7} {stream_ms:10.2f} {stream_chars:7}")
+
+    if sys.argv[1:]:
+        print(f"{'total':40} {totals['python-docx']:15.2f} {'':7} {totals['stream']:10.2f}")
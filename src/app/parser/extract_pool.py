@@ -0,0 +1,138 @@
+"""
+Process pool for CPU-bound document text extraction.
+
+pypdf and python-docx are pure Python and hold the GIL for the whole parse, so
+running them inside an ``async def`` freezes the event loop. Extraction jobs are
+shipped to a small pool of warm worker processes instead, and every job runs
+under a CPU time limit so a pathological document cannot pin a worker forever.
+"""
+
+import asyncio
+import multiprocessing
+import resource
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from app.config.env_vars import EnvironmentVars
+
+
+class ExtractionTimeout(Exception):
+    """Raised when a document exceeds its CPU time budget."""
+
+
+class _CpuLimitExceeded(BaseException):
+    # BaseException so library code doing `except Exception` cannot swallow it.
+    pass
+
+
+def _on_cpu_limit(signum, frame):
+    raise _CpuLimitExceeded()
+
+
+def _init_worker():
+    # Pay the import cost once per worker instead of once per document.
+    import docx  # noqa: F401
+    import pypdf  # noqa: F401
+
+    signal.signal(signal.SIGXCPU, _on_cpu_limit)
+
+
+def _cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def _run_limited(cpu_seconds: int, fn: Callable[..., Any], *args) -> Any:
+    """Run fn in the worker with a soft RLIMIT_CPU of cpu_seconds from now."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    limit = int(_cpu_time()) + cpu_seconds + 1
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (limit, hard))
+    try:
+        return fn(*args)
+    except _CpuLimitExceeded:
+        raise ExtractionTimeout(f"Extraction exceeded {cpu_seconds}s of CPU time")
+    finally:
+        resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def _ping() -> None:
+    time.sleep(0.05)
+
+
+class ExtractionPool:
+    def __init__(self, max_workers: int, cpu_seconds: int):
+        self._max_workers = max_workers
+        self._cpu_seconds = cpu_seconds
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Serialises creating, replacing and shutting down the executor.
+        self._lock = asyncio.Lock()
+
+    @property
+    def max_workers(self):
+        return self._max_workers
+
+    @property
+    def cpu_seconds(self):
+        return self._cpu_seconds
+
+    async def start(self):
+        async with self._lock:
+            if self._executor is None:
+                await self._spawn()
+
+    async def _spawn(self):
+        # "spawn" keeps workers independent of the event loop and Mongo client
+        # threads that already exist in the server process.
+        self._executor = ProcessPoolExecutor(
+            max_workers=self._max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Workers are spawned on demand; overlapping pings bring all of them up now.
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *[loop.run_in_executor(self._executor, _ping) for _ in range(self._max_workers)]
+        )
+
+    async def end(self):
+        async with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args) -> Any:
+        """Run a picklable top-level function in a worker under the CPU limit."""
+        if self._executor is None:
+            await self.start()
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                executor, _run_limited, self._cpu_seconds, fn, *args
+            )
+        except BrokenProcessPool:
+            # A worker died hard (OOM kill, segfault in a C extension). Replace
+            # the pool so the next document gets fresh workers.
+            await self._replace(executor)
+            raise
+
+    async def _replace(self, broken: ProcessPoolExecutor):
+        async with self._lock:
+            # Every job on the broken pool fails at once; only the first caller
+            # replaces it, and nobody shuts down the pool that replaced it.
+            if self._executor is not broken:
+                return
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            await self._spawn()
+
+
+extraction_pool = ExtractionPool(
+    max_workers=EnvironmentVars.EXTRACT_WORKERS,
+    cpu_seconds=EnvironmentVars.EXTRACT_CPU_SECONDS,
+)
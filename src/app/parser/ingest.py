@@ -0,0 +1,129 @@
+"""
+Streaming, size-capped ingestion of uploaded resumes.
+
+The upload is copied chunk by chunk into a spool file instead of being read
+into one ``bytes`` object. The first chunk is sniffed for the PDF / ZIP magic
+bytes so mislabelled files are rejected before the rest is read, and the byte
+count is enforced while streaming so oversize uploads stop early. Extractors
+open the spool file by path (PDFs are memory-mapped), so the document is never
+duplicated in memory or pickled across to the extraction workers.
+"""
+
+import hashlib
+import os
+import tempfile
+import zipfile
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import HTTPException, UploadFile
+
+from app.config.env_vars import EnvironmentVars
+
+CHUNK_SIZE = 64 * 1024
+
+# The PDF spec lets "%PDF-" appear anywhere in the first 1024 bytes.
+PDF_MAGIC = b"%PDF-"
+PDF_MAGIC_WINDOW = 1024
+ZIP_MAGIC = b"PK\x03\x04"
+
+DOCX_REQUIRED_PARTS = ["[Content_Types].xml", "word/document.xml"]
+
+
+@dataclass
+class IngestedFile:
+    filename: str
+    kind: str  # "pdf" or "docx"
+    path: str
+    size: int
+    # BLAKE2b of the raw bytes, computed while streaming.
+    digest: str = ""
+
+    def close(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _kind_from_filename(filename: Optional[str]) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".pdf"):
+        return "pdf"
+    if name.endswith(".docx"):
+        return "docx"
+    raise HTTPException(status_code=400, detail="Only PDF and DOCX files")
+
+
+def _sniff(head: bytes) -> Optional[str]:
+    if PDF_MAGIC in head[:PDF_MAGIC_WINDOW]:
+        return "pdf"
+    if head.startswith(ZIP_MAGIC):
+        return "docx"
+    return None
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Maximum size is {EnvironmentVars.UPLOAD_MAX_BYTES} bytes.",
+    )
+
+
+def _unsupported(detail: str) -> HTTPException:
+    return HTTPException(status_code=415, detail=detail)
+
+
+async def ingest_upload(file: UploadFile) -> IngestedFile:
+    """Stream an upload into a spool file, validating type and size on the way."""
+    kind = _kind_from_filename(file.filename)
+    max_bytes = EnvironmentVars.UPLOAD_MAX_BYTES
+
+    # Multipart parsing already knows the part size; reject before copying.
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large()
+
+    head = await file.read(CHUNK_SIZE)
+    sniffed = _sniff(head)
+    if sniffed is None:
+        raise _unsupported("File content is neither a PDF nor a DOCX document.")
+    if sniffed != kind:
+        raise _unsupported(f"File extension does not match its content ({sniffed}).")
+
+    spool = tempfile.NamedTemporaryFile(
+        prefix="resume-", suffix=f".{kind}", dir=EnvironmentVars.UPLOAD_SPOOL_DIR, delete=False
+    )
+    ingested = IngestedFile(filename=file.filename, kind=kind, path=spool.name, size=0)
+    hasher = hashlib.blake2b(digest_size=32)
+    try:
+        with spool:
+            chunk = head
+            while chunk:
+                ingested.size += len(chunk)
+                if ingested.size > max_bytes:
+                    raise _too_large()
+                hasher.update(chunk)
+                spool.write(chunk)
+                chunk = await file.read(CHUNK_SIZE)
+        ingested.digest = hasher.hexdigest()
+
+        if kind == "docx":
+            _check_docx_package(ingested.path)
+    except BaseException:
+        ingested.close()
+        raise
+
+    return ingested
+
+
+def _check_docx_package(path: str):
+    # Only the central directory is read here, not the member contents.
+    try:
+        with zipfile.ZipFile(path) as package:
+            names = set(package.namelist())
+    except zipfile.BadZipFile:
+        raise _unsupported("DOCX file is not a valid ZIP package.")
+
+    missing = [part for part in DOCX_REQUIRED_PARTS if part not in names]
+    if missing:
+        raise _unsupported(f"DOCX package is missing {', '.join(missing)}.")
@@ -0,0 +1,148 @@
+"""
+Layout-aware text blocks.
+
+Structured extraction returns one TextBlock per visual line (PDF) or paragraph
+/ table row (DOCX) together with its typography, so later stages can find
+section headers from font size and weight in a single pass instead of
+rediscovering structure with regexes.
+"""
+
+import math
+import statistics
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+BOLD_FONT_MARKERS = ("bold", "black", "heavy", "semibold", "demi")
+HEADING_SIZE_RATIO = 1.15
+HEADING_MAX_WORDS = 6
+HEADING_MAX_CHARS = 60
+
+
+@dataclass
+class TextBlock:
+    text: str  # May contain "\n" for explicit line breaks inside a paragraph.
+    page: int  # 1-based
+    # (x0, y0, x1, y1) in PDF points with the origin at the bottom left. The
+    # right edge is estimated from the character count. None for DOCX.
+    bbox: Optional[Tuple[float, float, float, float]] = None
+    font_size: Optional[float] = None
+    bold: bool = False
+    style: Optional[str] = None  # DOCX paragraph style id, e.g. "Heading1"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TextBlock":
+        bbox = data.get("bbox")
+        return cls(**{**data, "bbox": tuple(bbox) if bbox else None})
+
+
+@dataclass
+class ExtractedDocument:
+    text: str
+    blocks: Optional[List[TextBlock]] = None
+
+
+def is_bold_font(font_dict) -> bool:
+    if not font_dict:
+        return False
+    base_font = str(font_dict.get("/BaseFont", "")).lower()
+    return any(marker in base_font for marker in BOLD_FONT_MARKERS)
+
+
+class PdfLineCollector:
+    """pypdf ``visitor_text`` callback that groups text runs into visual lines."""
+
+    def __init__(self, page: int):
+        self.page = page
+        self.blocks: List[TextBlock] = []
+        self._parts: List[str] = []
+        self._bold: List[bool] = []
+        self._size = 0.0
+        self._x0 = self._x1 = self._y = 0.0
+
+    def __call__(self, text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            if text and "\n" in text:
+                self.flush()
+            return
+
+        # Text space -> user space: the Tf size is scaled by both matrices.
+        size = abs(font_size or 0) * math.hypot(tm[2], tm[3]) * math.hypot(cm[2], cm[3])
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+
+        if self._parts and abs(y - self._y) > max(size, self._size, 1.0) * 0.5:
+            self.flush()
+        if not self._parts:
+            self._x0, self._y = x, y
+
+        self._parts.append(text)
+        self._bold.append(is_bold_font(font_dict))
+        self._size = max(self._size, size)
+        # No glyph widths without font metrics; half an em per character.
+        self._x1 = max(self._x1, x + len(text) * size * 0.5)
+
+    def flush(self):
+        text = "".join(self._parts).strip()
+        if text:
+            self.blocks.append(
+                TextBlock(
+                    text=text,
+                    page=self.page,
+                    bbox=(
+                        round(self._x0, 2),
+                        round(self._y, 2),
+                        round(self._x1, 2),
+                        round(self._y + self._size, 2),
+                    ),
+                    font_size=round(self._size, 2) or None,
+                    bold=all(self._bold),
+                )
+            )
+        self._parts, self._bold = [], []
+        self._size = self._x1 = 0.0
+
+
+def body_font_size(blocks: List[TextBlock]) -> Optional[float]:
+    """Character-weighted median font size, i.e. the size of body text."""
+    sizes = []
+    for block in blocks:
+        if block.font_size:
+            sizes.extend([block.font_size] * min(len(block.text), 200))
+    return statistics.median(sizes) if sizes else None
+
+
+def detect_headings(blocks: List[TextBlock]) -> Dict[int, bool]:
+    """Blocks that look like section headers, found in one linear pass.
+
+    A header is a short line that is set larger than body text, is bold while
+    most text is not, or uses a DOCX heading style. Each index maps to True
+    when the block is set apart by style or size, and to False when it is only
+    bold: resumes also bold employer, school and project names, so a bold line
+    is a header only if its words read as one.
+    """
+    body_size = body_font_size(blocks)
+    bold_chars = sum(len(block.text) for block in blocks if block.bold)
+    total_chars = sum(len(block.text) for block in blocks) or 1
+    bold_is_emphasis = bold_chars / total_chars < 0.5
+
+    headings = {}
+    for index, block in enumerate(blocks):
+        text = block.text.strip()
+        if (
+            not text
+            or "\n" in text
+            or len(text) > HEADING_MAX_CHARS
+            or len(text.split()) > HEADING_MAX_WORDS
+            or not any(c.isalpha() for c in text)
+        ):
+            continue
+
+        styled = bool(block.style) and block.style.lower().startswith(("heading", "title"))
+        larger = bool(body_size and block.font_size and block.font_size >= body_size * HEADING_SIZE_RATIO)
+        emphasised = block.bold and bold_is_emphasis
+        if styled or larger or emphasised:
+            headings[index] = styled or larger
+    return headings
@@ -1,12 +1,20 @@
-import google.generativeai as genai
 import json
 import time
 from dataclasses import dataclass
+from typing import Union
 from fastapi import UploadFile
 
-from app.parser.text_extract import extract_text_from_file
-from app.model.schema.resume.together import Resume
 from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import llm_gateway
+from app.llm.retry import retry_policy
+from app.parser.prompt_sections import SectionSlicer
+from app.parser.rules import apply_rules, extract_rules, link_platform
+from app.parser.ingest import IngestedFile
+from app.parser.text_extract import EXTRACTOR_VERSION, extract_document
+from app.model.schema.resume.together import Resume
+
+# Bump whenever the prompt below changes so cached responses are not reused.
+PROMPT_VERSION = "pipeline1-v1"
 
 @dataclass
 class ParseResult:
@@ -14,15 +22,20 @@ class ParseResult:
     tokens_used: int
     processing_time: float
     cost_estimate: float
+    cache_hits: int = 0
 
 class Pipeline1Parser:
+    # Stored with each resume; a stored parse is only reused while it matches.
+    VERSION = f"extract-{EXTRACTOR_VERSION}+{PROMPT_VERSION}"
+    
     def __init__(self):
-        genai.configure(api_key=EnvironmentVars.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = 'gemini-1.5-flash'
     
-    async def parse_resume(self, file: UploadFile) -> ParseResult:
+    async def parse_resume(self, file: Union[UploadFile, IngestedFile]) -> ParseResult:
         start_time = time.time()
-        resume_text = await extract_text_from_file(file)
+        document = await extract_document(file, structured=EnvironmentVars.STRUCTURED_EXTRACTION)
+        resume_text = document.text
+        prompt_text = SectionSlicer(resume_text, blocks=document.blocks).for_extraction()
         
         prompt = f"""Extract ALL information from this resume into JSON. Follow these rules exactly:
 
@@ -38,15 +51,13 @@ CATEGORIZATION RULES:
 - Extract ALL dates - parse "2023-present", "2023-2025", "May 2025-present" carefully
 - Extract ALL role titles - never leave null if any title/position exists
 - Group related activities under same organization when possible
+- Do NOT extract email, phone number or links; they are filled in separately
 
 JSON STRUCTURE:
 {{
   "personal_info": {{
     "name": "Full Name",
-    "home_address": {{"city": "City", "state": "State", "zip_code": null}},
-    "phone_number": "phone if available",
-    "email": "email@domain.com", 
-    "links": ["linkedin", "github", "other"]
+    "home_address": {{"city": "City", "state": "State", "zip_code": null}}
   }},
   "education_items": [
     {{
@@ -94,55 +105,32 @@ CRITICAL INSTRUCTIONS - FOLLOW EXACTLY:
 8. RESEARCH PROJECTS: Keep as part of the lab/organization, don't separate into standalone projects
 
 Resume:
-{resume_text}"""
+{prompt_text}"""
         
-        response = self.model.generate_content(
-            prompt,
-            generation_config=genai.types.GenerationConfig(
-                temperature=0.2,
-                max_output_tokens=8192,
-                response_mime_type="application/json"
-            )
-        )
+        response = await retry_policy.run("pipeline1.parse", lambda: llm_gateway.gemini(
+            prompt, model=self.model, temperature=0.2, max_output_tokens=8192,
+            prompt_version=PROMPT_VERSION
+        ))
         
         processing_time = time.time() - start_time
-        tokens_used = self._estimate_tokens(prompt, response.text)
-        cost = self._calculate_cost(prompt, response.text)
+        tokens_used = response.total_tokens
+        cost = response.cost
         
         parsed_data = json.loads(response.text)
         self._clean_data(parsed_data)
+        apply_rules(parsed_data, extract_rules(resume_text), resume_text)
         resume = Resume.model_validate(parsed_data)
         
-        return ParseResult(resume, tokens_used, processing_time, cost)
-    
-    def _estimate_tokens(self, input_text: str, output_text: str) -> int:
-        input_tokens = len(input_text.split()) * 1.3
-        output_tokens = len(output_text.split()) * 1.3
-        return int(input_tokens + output_tokens)
-    
-    def _calculate_cost(self, input_text: str, output_text: str) -> float:
-        input_tokens = len(input_text.split()) * 1.3
-        output_tokens = len(output_text.split()) * 1.3
-        
-        input_cost = (input_tokens / 1_000_000) * 0.075
-        output_cost = (output_tokens / 1_000_000) * 0.30
-        
-        return input_cost + output_cost
+        return ParseResult(resume, tokens_used, processing_time, cost, cache_hits=int(response.cached))
     
     def _clean_data(self, data):
-        # Fix links
+        # Links are filled in by the rule-based extractor; normalise any the
+        # model returned anyway to platform names.
         if "personal_info" in data and "links" in data["personal_info"]:
-            cleaned_links = []
-            for link in data["personal_info"]["links"]:
-                if "linkedin" in str(link).lower():
-                    cleaned_links.append("linkedin")
-                elif "github" in str(link).lower():
-                    cleaned_links.append("github")
-                else:
-                    cleaned_links.append("other")
-            data["personal_info"]["links"] = cleaned_links
+            data["personal_info"]["links"] = [
+                link_platform(link).value for link in data["personal_info"]["links"]
+            ]
         
-    
         for item in data.get("education_items", []):
             for course in item.get("relevant_coursework", []):
                 if not course.get("code"):
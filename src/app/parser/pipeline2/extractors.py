@@ -1,26 +1,27 @@
-import google.generativeai as genai
 import json
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 
-from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import LLMResult, llm_gateway
+from app.llm.retry import retry_policy
+
+# Bump whenever a prompt below changes so cached responses are not reused.
+FACTS_PROMPT_VERSION = "pipeline2-facts-v1"
+PATTERNS_PROMPT_VERSION = "pipeline2-patterns-v1"
 
 
 class Pipeline2Extractors:
     def __init__(self):
-        genai.configure(api_key=EnvironmentVars.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = 'gemini-1.5-flash'
     
-    def extract_facts(self, text: str) -> Dict[str, Any]:
+    async def extract_facts(self, text: str) -> Tuple[Dict[str, Any], Optional[LLMResult]]:
         """Extract comprehensive factual information (temp=0.0)"""
         prompt = f"""Extract ALL factual information exactly as written from this resume. Be comprehensive and detailed.
 
 EXTRACT EVERYTHING:
 1. PERSONAL INFO:
    - Full name (exact as written)
-   - Email address (exact format)
-   - Phone number (exact format)
    - Home address (complete address if available)
-   - All links and URLs (LinkedIn, GitHub, portfolio, etc.)
+   - Do NOT extract email, phone number or links; they are filled in separately
 
 2. EDUCATION:
    - School names (exact, full official names)
@@ -55,24 +56,12 @@ Return comprehensive JSON with this exact structure:
 {{
   "personal": {{
     "name": "Full Name As Written",
-    "email": "email@domain.com",
-    "phone": "phone number with formatting",
     "address": {{
       "full_address": "complete address if available",
       "city": "city name",
       "state": "state name",
       "zip_code": "zip code if available"
-    }},
-    "links": [
-      {{
-        "url": "https://linkedin.com/in/username",
-        "text": "text as it appears on resume"
-      }},
-      {{
-        "url": "https://github.com/username",
-        "text": "text as it appears on resume"
-      }}
-    ]
+    }}
   }},
   "education": [
     {{
@@ -161,20 +150,18 @@ Resume Text:
 {text}"""
         
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.0,
-                    max_output_tokens=8192,
-                    response_mime_type="application/json"
-                )
-            )
-            return json.loads(response.text)
+            response = await retry_policy.run("pipeline2.extract_facts", lambda: llm_gateway.gemini(
+                prompt, model=self.model, temperature=0.0, max_output_tokens=8192,
+                prompt_version=FACTS_PROMPT_VERSION
+            ))
+            return json.loads(response.text), response
         except Exception as e:
             print(f"Error in extract_facts: {e}")
-            return self._get_empty_factual_structure()
+            return self._get_empty_factual_structure(), None
     
-    def recognize_patterns(self, text: str, factual_data: Dict[str, Any]) -> Dict[str, Any]:
+    async def recognize_patterns(
+        self, text: str, factual_data: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[LLMResult]]:
         """Recognize patterns and enhance categorization (temp=0.1)"""
         prompt = f"""Using the factual data extracted from the resume, categorize and structure the information according to the resume schema requirements.
 
@@ -194,14 +181,7 @@ CATEGORIZATION RULES:
    - "technical": Programming languages, frameworks, tools, databases, cloud services, software, hardware
    - "transferable": Communication, leadership, teamwork, problem-solving, time management, adaptability
 
-4. Link Platforms:
-   - "linkedin": LinkedIn profiles
-   - "github": GitHub profiles
-   - "instagram": Instagram profiles
-   - "facebook": Facebook profiles
-   - "other": All other links
-
-5. Date Parsing Examples:
+4. Date Parsing Examples:
    - "Sep 2024 - Present" → start: {{"year": 2024, "month": 9}}, end: null
    - "Aug 2023 - May 2027" → start: {{"year": 2023, "month": 8}}, end: {{"year": 2027, "month": 5}}
    - "2023-2024" → start: {{"year": 2023, "month": null}}, end: {{"year": 2024, "month": null}}
@@ -242,14 +222,8 @@ Return enhanced categorization with this exact structure:
     {{"type": "technical", "category": "Frameworks", "skills": ["React", "Next.js"]}},
     {{"type": "transferable", "category": "Leadership", "skills": ["Communication", "Teamwork"]}}
   ],
-  "links_categorization": [
-    {{"url": "https://linkedin.com/in/username", "platform": "linkedin"}},
-    {{"url": "https://github.com/username", "platform": "github"}}
-  ],
   "personal_categorization": {{
     "name": "Full Name",
-    "email": "email@domain.com",
-    "phone": "phone number",
     "address": {{"city": "City", "state": "State", "zip_code": null}}
   }}
 }}
@@ -266,18 +240,14 @@ Original Resume Text for Context:
 {text}"""
         
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.1,
-                    max_output_tokens=8192,
-                    response_mime_type="application/json"
-                )
-            )
-            return json.loads(response.text)
+            response = await retry_policy.run("pipeline2.recognize_patterns", lambda: llm_gateway.gemini(
+                prompt, model=self.model, temperature=0.1, max_output_tokens=8192,
+                prompt_version=PATTERNS_PROMPT_VERSION
+            ))
+            return json.loads(response.text), response
         except Exception as e:
             print(f"Error in recognize_patterns: {e}")
-            return self._get_empty_pattern_structure()
+            return self._get_empty_pattern_structure(), None
     
     def _get_empty_factual_structure(self) -> Dict[str, Any]:
         """Return empty factual structure for error handling"""
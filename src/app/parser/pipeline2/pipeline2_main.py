@@ -1,12 +1,36 @@
+import asyncio
+import copy
+import re
 import time
 from dataclasses import dataclass
 from fastapi import UploadFile
-from typing import Dict, Any
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from app.parser.text_extract import extract_text_from_file
+from app.cache.section import CachedSection, section_cache
+from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import LLMResult
+from app.parser.prompt_sections import SectionSlicer
+from app.parser.rules import apply_rules, extract_rules
+from app.parser.section_parse import SCHEMA_SECTIONS
+from app.parser.ingest import IngestedFile
+from app.parser.text_extract import EXTRACTOR_VERSION, extract_document
 from app.model.schema.resume.together import Resume
-from .extractors import Pipeline2Extractors
-from .validator import Pipeline2Validator
+from .extractors import FACTS_PROMPT_VERSION, PATTERNS_PROMPT_VERSION, Pipeline2Extractors
+from .validator import COMBINE_PROMPT_VERSION, Pipeline2Validator
+
+# Stage 2 categorizes experiences, education and skills; contact details come
+# from the stage 1 facts, so the contact block is not resent.
+PATTERN_CONTEXT_SECTIONS = SCHEMA_SECTIONS + ["activities", "coursework"]
+
+# A cached section result depends on every stage prompt that produced it.
+SECTION_PROMPT_VERSIONS = [FACTS_PROMPT_VERSION, PATTERNS_PROMPT_VERSION, COMBINE_PROMPT_VERSION]
+
+LIST_FIELDS = ["education_items", "experience_items", "skills", "relevant_coursework", "paragraphs"]
+
+# A parsed item is credited to the section holding at least this share of its words.
+MIN_SECTION_OVERLAP = 0.5
+
+_WORD = re.compile(r"\w+")
 
 
 @dataclass
@@ -15,104 +39,214 @@ class ParseResult:
     tokens_used: int
     processing_time: float
     cost_estimate: float
+    cache_hits: int = 0
+    sections_reused: int = 0
+    # The minimal resume returned when parsing failed.
+    fallback: bool = False
 
 
 class Pipeline2Parser:
+    # Stored with each resume; a stored parse is only reused while it matches.
+    VERSION = "+".join([f"extract-{EXTRACTOR_VERSION}"] + SECTION_PROMPT_VERSIONS)
+    
     def __init__(self):
         self.extractors = Pipeline2Extractors()
         self.validator = Pipeline2Validator()
     
-    async def parse_resume(self, file: UploadFile) -> ParseResult:
+    async def parse_resume(self, file: Union[UploadFile, IngestedFile]) -> ParseResult:
         start_time = time.time()
         
         try:
             # Extract text from file
-            resume_text = await extract_text_from_file(file)
+            document = await extract_document(file, structured=EnvironmentVars.STRUCTURED_EXTRACTION)
+            resume_text = document.text
             print(f"Extracted text length: {len(resume_text)} characters")
+            slicer = SectionSlicer(resume_text, blocks=document.blocks)
+            sections_reused = 0
             
-            # Stage 1: Comprehensive factual extraction (temp=0.0)
-            print("Stage 1: Extracting comprehensive factual data...")
-            factual_data = self.extractors.extract_facts(resume_text)
-            
-            if not factual_data:
-                print("Warning: No factual data extracted")
-                factual_data = self.extractors._get_empty_factual_structure()
-            
-            print(f"Factual data extracted: {len(factual_data)} sections")
-            
-            # Stage 2: Pattern recognition and categorization (temp=0.1)
-            print("Stage 2: Recognizing patterns and categorizing...")
-            pattern_data = self.extractors.recognize_patterns(resume_text, factual_data)
+            if slicer.confident and section_cache.enabled:
+                # A resubmitted resume only pays for the sections whose text changed.
+                cleaned_data, calls, sections_reused = await self._parse_by_section(slicer)
+            else:
+                cleaned_data, calls = await self._parse_whole(slicer)
             
-            if not pattern_data:
-                print("Warning: No pattern data extracted")
-                pattern_data = self.extractors._get_empty_pattern_structure()
-            
-            print(f"Pattern data extracted: {len(pattern_data)} categories")
-            
-            # Stage 3: Validation and schema mapping (temp=0.0)
-            print("Stage 3: Validating and combining into final structure...")
-            final_data = self.validator.validate_and_combine(factual_data, pattern_data)
-            
-            if not final_data:
-                print("Warning: LLM validation failed, using fallback")
-                final_data = self.validator._get_fallback_structure(factual_data, pattern_data)
-            
-            print(f"Final data structure created with {len(final_data)} sections")
-            
-            # Stage 4: Data cleaning and validation
-            print("Stage 4: Cleaning and validating data...")
-            cleaned_data = self.validator.clean_data(final_data)
-            
-            print(f"Data cleaned successfully")
+            apply_rules(cleaned_data, extract_rules(resume_text), resume_text)
             
             # Create resume object
             print("Creating Resume object...")
             resume = Resume.model_validate(cleaned_data)
             
             processing_time = time.time() - start_time
-            tokens_used = self._estimate_tokens(resume_text, factual_data, pattern_data, final_data)
-            cost = self._calculate_cost(tokens_used)
+            tokens_used = self._total_tokens(calls)
+            cost = self._total_cost(calls)
+            cache_hits = sum(1 for call in calls if call and call.cached)
             
             print(f"Pipeline 2 completed in {processing_time:.2f}s")
-            print(f"Estimated tokens used: {tokens_used}")
-            print(f"Estimated cost: ${cost:.4f}")
+            print(f"Tokens used: {tokens_used}")
+            print(f"Cost: ${cost:.4f}, cached stages: {cache_hits}, reused sections: {sections_reused}")
             
-            return ParseResult(resume, tokens_used, processing_time, cost)
+            return ParseResult(resume, tokens_used, processing_time, cost, cache_hits, sections_reused)
             
         except Exception as e:
             print(f"Error in Pipeline 2: {e}")
             # Return a minimal fallback resume
             processing_time = time.time() - start_time
             fallback_resume = self._create_fallback_resume()
-            return ParseResult(fallback_resume, 1000, processing_time, 0.01)
+            return ParseResult(fallback_resume, 1000, processing_time, 0.01, fallback=True)
+    
+    async def _parse_text(
+        self, facts_text: str, context_text: str, label: str = "resume"
+    ) -> Tuple[Dict[str, Any], List[Optional[LLMResult]]]:
+        """Run the three LLM stages and cleaning over one piece of resume text"""
+        # Stage 1: Comprehensive factual extraction (temp=0.0)
+        print(f"[{label}] Stage 1: Extracting comprehensive factual data...")
+        factual_data, facts_call = await self.extractors.extract_facts(facts_text)
+        
+        if not factual_data:
+            print(f"[{label}] Warning: No factual data extracted")
+            factual_data = self.extractors._get_empty_factual_structure()
+        
+        print(f"[{label}] Factual data extracted: {len(factual_data)} sections")
+        
+        # Stage 2: Pattern recognition and categorization (temp=0.1)
+        print(f"[{label}] Stage 2: Recognizing patterns and categorizing...")
+        pattern_data, patterns_call = await self.extractors.recognize_patterns(context_text, factual_data)
+        
+        if not pattern_data:
+            print(f"[{label}] Warning: No pattern data extracted")
+            pattern_data = self.extractors._get_empty_pattern_structure()
+        
+        print(f"[{label}] Pattern data extracted: {len(pattern_data)} categories")
+        
+        # Stage 3: Validation and schema mapping (temp=0.0)
+        print(f"[{label}] Stage 3: Validating and combining into final structure...")
+        final_data, combine_call = await self.validator.validate_and_combine(factual_data, pattern_data)
+        
+        if not final_data:
+            print(f"[{label}] Warning: LLM validation failed, using fallback")
+            final_data = self.validator._get_fallback_structure(factual_data, pattern_data)
+        
+        print(f"[{label}] Final data structure created with {len(final_data)} sections")
+        
+        # Stage 4: Data cleaning and validation
+        print(f"[{label}] Stage 4: Cleaning and validating data...")
+        cleaned_data = self.validator.clean_data(final_data)
+        
+        return cleaned_data, [facts_call, patterns_call, combine_call]
+    
+    async def _parse_whole(self, slicer: SectionSlicer) -> Tuple[Dict[str, Any], List[Optional[LLMResult]]]:
+        """The three stages over the whole resume, each sent only the sections it needs"""
+        facts_text = slicer.for_extraction()
+        context_text = slicer.select(PATTERN_CONTEXT_SECTIONS)
+        print(f"Prompt text: stage 1 {len(facts_text)} chars, stage 2 {len(context_text)} chars "
+              f"(sliced: {slicer.confident})")
+        return await self._parse_text(facts_text, context_text)
     
-    def _estimate_tokens(self, text: str, factual_data: Dict[str, Any], pattern_data: Dict[str, Any], final_data: Dict[str, Any]) -> int:
-        """Estimate total tokens for all API calls"""
-        base_tokens = len(text.split()) * 1.3
+    async def _parse_by_section(
+        self, slicer: SectionSlicer
+    ) -> Tuple[Dict[str, Any], List[Optional[LLMResult]], int]:
+        """Reuse cached results for unchanged sections and parse the rest in one three-stage pass.
         
-        # Stage 1: Comprehensive factual extraction
-        stage1_input = base_tokens + 1000  # Enhanced prompt
-        stage1_output = len(str(factual_data).split()) * 1.3 if factual_data else 500
+        The items of a fresh result are credited back to the sections they came
+        from and cached per section; a result that cannot be split cleanly is
+        used as it is and not cached.
+        """
+        chunks = slicer.chunks()
+        keys = [section_cache.make_key(SECTION_PROMPT_VERSIONS, name, text) for name, text in chunks]
+        cached = await asyncio.gather(*[section_cache.get(key) for key in keys])
+        missed = [i for i, hit in enumerate(cached) if hit is None]
+        reused = len(chunks) - len(missed)
         
-        # Stage 2: Pattern recognition with context
-        stage2_input = base_tokens + len(str(factual_data).split()) * 1.3 + 1200
-        stage2_output = len(str(pattern_data).split()) * 1.3 if pattern_data else 500
+        calls: List[Optional[LLMResult]] = []
+        fresh: Dict[int, Dict[str, Any]] = {}
+        if missed:
+            if reused:
+                print(f"Reusing {reused} cached sections; parsing {', '.join(chunks[i][0] for i in missed)}")
+                text = "\n\n".join(chunks[i][1] for i in missed)
+                data, calls = await self._parse_text(text, text)
+            else:
+                data, calls = await self._parse_whole(slicer)
+            
+            # A stage that fell back to its empty structure must not be replayed.
+            split = self._split_by_section(data, [chunks[i] for i in missed]) if all(calls) else None
+            if split is not None:
+                for i, part in zip(missed, split):
+                    fresh[i] = part
+                    await section_cache.put(keys[i], CachedSection(
+                        section=chunks[i][0], data=copy.deepcopy(part), prompt_versions=SECTION_PROMPT_VERSIONS
+                    ))
+            if not reused:
+                return data, calls, 0
+            if split is None:
+                label = "contact" if any(chunks[i][0] == "contact" for i in missed) else "parsed"
+                parts = [(chunks[i][0], cached[i].data) for i in range(len(chunks)) if cached[i] is not None]
+                return self._merge_sections(parts + [(label, data)]), calls, reused
         
-        # Stage 3: Detailed validation and mapping
-        stage3_input = base_tokens + len(str(factual_data).split()) * 1.3 + len(str(pattern_data).split()) * 1.3 + 1400
-        stage3_output = len(str(final_data).split()) * 1.3 if final_data else 500
+        parts = [(name, fresh[i] if i in fresh else cached[i].data) for i, (name, _) in enumerate(chunks)]
+        return self._merge_sections(parts), calls, reused
+    
+    def _split_by_section(
+        self, data: Dict[str, Any], chunks: List[Tuple[str, str]]
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Per-section parts of a parse, crediting each item to the section sharing most of its words"""
+        names = [name for name, _ in chunks]
+        chunk_words = [set(_WORD.findall(text.lower())) for _, text in chunks]
+        parts: List[Dict[str, Any]] = [{field: [] for field in LIST_FIELDS} for _ in chunks]
         
-        total_tokens = stage1_input + stage1_output + stage2_input + stage2_output + stage3_input + stage3_output
+        personal = data.get("personal_info")
+        if "contact" in names:
+            if personal:
+                parts[names.index("contact")]["personal_info"] = personal
+        elif personal and personal.get("name") not in (None, "Unknown"):
+            # A name found outside the contact block means the chunks were not
+            # where the parse found them. The "Unknown" placeholder that
+            # clean_data always adds (and any links or email the rules took
+            # from these sections) belongs to no section and is dropped.
+            return None
         
-        return int(total_tokens)
+        for field in LIST_FIELDS:
+            for item in data.get(field) or []:
+                words = set(_WORD.findall(" ".join(_strings(item)).lower()))
+                if not words:
+                    continue
+                overlaps = [len(words & section) / len(words) for section in chunk_words]
+                best = max(range(len(chunks)), key=overlaps.__getitem__)
+                if overlaps[best] < MIN_SECTION_OVERLAP:
+                    return None
+                parts[best][field].append(item)
+        return parts
     
-    def _calculate_cost(self, tokens: int) -> float:
-        """Calculate cost based on Gemini Flash pricing"""
-        # Gemini Flash pricing (approximate)
-        input_cost = (tokens * 0.7) / 1_000_000 * 0.075  # 70% input tokens
-        output_cost = (tokens * 0.3) / 1_000_000 * 0.30  # 30% output tokens
-        return input_cost + output_cost
+    def _merge_sections(self, parts: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Splice per-section results back into one resume, in document order"""
+        # Cached results are shared; later cleaning and rule merging mutate these.
+        parts = copy.deepcopy(parts)
+        merged: Dict[str, Any] = {field: [] for field in LIST_FIELDS}
+        
+        # The contact block owns personal info; other sections only fill in a
+        # name the contact block did not yield.
+        personal = None
+        for name, data in sorted(parts, key=lambda part: part[0] != "contact"):
+            candidate = data.get("personal_info") or {}
+            if candidate.get("name") and candidate["name"] != "Unknown":
+                personal = candidate
+                break
+            if personal is None:
+                personal = candidate
+        merged["personal_info"] = personal or {}
+        
+        for _, data in parts:
+            for field in LIST_FIELDS:
+                merged[field].extend(data.get(field) or [])
+        
+        return self.validator.clean_data(merged)
+    
+    def _total_tokens(self, calls: List[Optional[LLMResult]]) -> int:
+        """Tokens reported by the provider across the stages that succeeded"""
+        return sum(call.total_tokens for call in calls if call)
+    
+    def _total_cost(self, calls: List[Optional[LLMResult]]) -> float:
+        """Cost of the stages that succeeded, from reported token usage"""
+        return sum(call.cost for call in calls if call)
     
     def _create_fallback_resume(self) -> Resume:
         """Create a minimal fallback resume when parsing fails"""
@@ -136,4 +270,15 @@ class Pipeline2Parser:
             relevant_coursework=[],
             experience_items=[],
             paragraphs=[]
-        )
\ No newline at end of file
+        )
+
+
+def _strings(value: Any) -> List[str]:
+    """Every string inside a parsed item"""
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, dict):
+        return [text for child in value.values() for text in _strings(child)]
+    if isinstance(value, list):
+        return [text for child in value for text in _strings(child)]
+    return []
@@ -1,16 +1,21 @@
-import google.generativeai as genai
 import json
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 
-from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import LLMResult, llm_gateway
+from app.llm.retry import retry_policy
+from app.parser.rules import link_platform
+
+# Bump whenever the prompt below changes so cached responses are not reused.
+COMBINE_PROMPT_VERSION = "pipeline2-combine-v1"
 
 
 class Pipeline2Validator:
     def __init__(self):
-        genai.configure(api_key=EnvironmentVars.GEMINI_API_KEY)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.model = 'gemini-1.5-flash'
     
-    def validate_and_combine(self, factual: Dict[str, Any], patterns: Dict[str, Any]) -> Dict[str, Any]:
+    async def validate_and_combine(
+        self, factual: Dict[str, Any], patterns: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[LLMResult]]:
         """Validate and combine into final resume structure (temp=0.0)"""
         prompt = f"""Combine the factual data and pattern categorization into the EXACT resume schema. You must preserve ALL information from the factual data.
 
@@ -20,21 +25,18 @@ CRITICAL RULES:
 3. Ensure ALL bullet points are preserved in paragraphs arrays
 4. Ensure ALL coursework is preserved
 5. Ensure ALL skills are preserved and properly categorized
-6. Ensure ALL links are preserved with proper platform identification
+6. Omit email, phone number and links; they are filled in separately
 7. Fill in missing information with null values, never omit fields
 
 EXACT SCHEMA TO MATCH:
 {{
   "personal_info": {{
     "name": "Full Name From Factual Data",
-    "email": "email@domain.com or null",
-    "phone_number": "phone number or null",
     "home_address": {{
       "city": "City Name or null",
       "state": "State Name or null",
       "zip_code": "Zip Code or null"
-    }},
-    "links": ["linkedin", "github", "other"]
+    }}
   }},
   "education_items": [
     {{
@@ -102,7 +104,6 @@ EXACT SCHEMA TO MATCH:
 MAPPING INSTRUCTIONS:
 1. Personal Info:
    - Use factual.personal data
-   - Convert links to platform names only (linkedin, github, other)
    - Map address fields correctly
 
 2. Education Items:
@@ -137,18 +138,14 @@ Pattern Data:
 Return the complete resume following the exact schema above. Ensure no information is lost:"""
         
         try:
-            response = self.model.generate_content(
-                prompt,
-                generation_config=genai.types.GenerationConfig(
-                    temperature=0.0,
-                    max_output_tokens=8192,
-                    response_mime_type="application/json"
-                )
-            )
-            return json.loads(response.text)
+            response = await retry_policy.run("pipeline2.validate_and_combine", lambda: llm_gateway.gemini(
+                prompt, model=self.model, temperature=0.0, max_output_tokens=8192,
+                prompt_version=COMBINE_PROMPT_VERSION
+            ))
+            return json.loads(response.text), response
         except Exception as e:
             print(f"Error in validate_and_combine: {e}")
-            return self._get_fallback_structure(factual, patterns)
+            return self._get_fallback_structure(factual, patterns), None
     
     def clean_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Clean and ensure data structure completeness"""
@@ -218,37 +215,8 @@ Return the complete resume following the exact schema above. Ensure no informati
             cleaned_links = []
             for link in personal["links"]:
                 if isinstance(link, dict):
-                    if "platform" in link:
-                        cleaned_links.append(str(link["platform"]))
-                    elif "url" in link:
-                        # Determine platform from URL
-                        url = str(link["url"]).lower()
-                        if "linkedin" in url:
-                            cleaned_links.append("linkedin")
-                        elif "github" in url:
-                            cleaned_links.append("github")
-                        elif "instagram" in url:
-                            cleaned_links.append("instagram")
-                        elif "facebook" in url:
-                            cleaned_links.append("facebook")
-                        else:
-                            cleaned_links.append("other")
-                    else:
-                        cleaned_links.append("other")
-                elif isinstance(link, str):
-                    # If it's already a platform string, keep it
-                    if link.lower() in ["linkedin", "github", "instagram", "facebook", "handshake", "other"]:
-                        cleaned_links.append(link.lower())
-                    else:
-                        # Try to determine platform from string
-                        if "linkedin" in link.lower():
-                            cleaned_links.append("linkedin")
-                        elif "github" in link.lower():
-                            cleaned_links.append("github")
-                        else:
-                            cleaned_links.append("other")
-                else:
-                    cleaned_links.append("other")
+                    link = link.get("platform") or link.get("url") or ""
+                cleaned_links.append(link_platform(str(link)).value)
             personal["links"] = cleaned_links
     
     def _clean_education_item(self, item: Dict[str, Any]) -> None:
@@ -6,7 +6,13 @@ accuracy while minimizing cost. Routes based on document complexity.
 
 Components:
 - router.py: Determines local vs cloud processing
+- routing.json: Reloadable cascade thresholds
+- repair.py: Field-level patching of weak local results
 - local.py: Ollama + Llama 3.2 processing
+- scheduler.py: Deadline-ordered admission to the local model
+- json_stream.py: Incremental JSON checks on streamed local output
+- output_schema.py: JSON Schema constraining the local model's output
+- warmup.py: Keeps the local model loaded
 - cloud.py: OpenAI processing for complex cases
 - pipeline3_main.py: Main pipeline orchestrator
 """
@@ -3,13 +3,21 @@ Cloud processor using OpenAI for validation and enhancement.
 Handles 20% of processing for accuracy boost and edge case handling.
 """
 
+import copy
 import json
 import time
-import openai
 from dataclasses import dataclass
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 
-from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import llm_gateway
+from app.llm.retry import retry_policy
+from app.parser.rules import apply_rules, extract_rules
+from .repair import WeakField, apply_patch
+
+# Bump whenever a prompt below changes so cached responses are not reused.
+EXTRACT_PROMPT_VERSION = "pipeline3-cloud-extract-v1"
+ENHANCE_PROMPT_VERSION = "pipeline3-cloud-enhance-v1"
+REPAIR_PROMPT_VERSION = "pipeline3-cloud-repair-v1"
 
 @dataclass
 class CloudResult:
@@ -18,33 +26,31 @@ class CloudResult:
     confidence: float
     processing_time: float
     cost: float
+    tokens_used: int = 0
+    cached: bool = False
     error: Optional[str] = None
 
 class CloudProcessor:
     def __init__(self):
-        self.client = openai.OpenAI(api_key=EnvironmentVars.OPENAI_API_KEY)
         self.model = "gpt-4o-mini"
         
     async def process(self, text: str) -> CloudResult:
         start_time = time.time()
         
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = await retry_policy.run("pipeline3.extract", lambda: llm_gateway.openai(
+                [
                     {"role": "system", "content": self._get_system_prompt()},
                     {"role": "user", "content": f"Extract resume data:\n\n{text}"}
                 ],
+                model=self.model,
                 temperature=0.1,
                 max_tokens=2000,
-                response_format={"type": "json_object"}
-            )
-            
-            content = response.choices[0].message.content
-            data = json.loads(content)
+                prompt_version=EXTRACT_PROMPT_VERSION
+            ))
             
-            # Calculate cost
-            cost = self._calculate_cost(response.usage)
+            data = json.loads(response.text)
+            apply_rules(data, extract_rules(text), text)
             confidence = self._calculate_confidence(data)
             
             return CloudResult(
@@ -52,7 +58,9 @@ class CloudProcessor:
                 data=self._validate_structure(data),
                 confidence=confidence,
                 processing_time=time.time() - start_time,
-                cost=cost
+                cost=response.cost,
+                tokens_used=response.total_tokens,
+                cached=response.cached
             )
             
         except Exception as e:
@@ -86,21 +94,19 @@ Tasks:
 
 Return the corrected/enhanced JSON in the same format."""
 
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
+            response = await retry_policy.run("pipeline3.enhance", lambda: llm_gateway.openai(
+                [
                     {"role": "system", "content": self._get_enhancement_prompt()},
                     {"role": "user", "content": prompt}
                 ],
+                model=self.model,
                 temperature=0.1,
                 max_tokens=2000,
-                response_format={"type": "json_object"}
-            )
+                prompt_version=ENHANCE_PROMPT_VERSION
+            ))
             
-            content = response.choices[0].message.content
-            data = json.loads(content)
-            
-            cost = self._calculate_cost(response.usage)
+            data = json.loads(response.text)
+            apply_rules(data, extract_rules(text), text)
             confidence = self._calculate_confidence(data)
             
             return CloudResult(
@@ -108,7 +114,9 @@ Return the corrected/enhanced JSON in the same format."""
                 data=self._validate_structure(data),
                 confidence=confidence,
                 processing_time=time.time() - start_time,
-                cost=cost
+                cost=response.cost,
+                tokens_used=response.total_tokens,
+                cached=response.cached
             )
             
         except Exception as e:
@@ -121,6 +129,54 @@ Return the corrected/enhanced JSON in the same format."""
                 error=str(e)
             )
     
+    async def repair(self, local_data: Dict[str, Any], weak_fields: List[WeakField]) -> CloudResult:
+        """Ask only for the weak fields of a local result and patch them in"""
+        start_time = time.time()
+        
+        try:
+            requests = "\n\n".join(
+                f"PATH: {field.path}\nPROBLEM: {field.reason}\nRESUME TEXT:\n{field.context}"
+                for field in weak_fields
+            )
+            response = await retry_policy.run("pipeline3.repair", lambda: llm_gateway.openai(
+                [
+                    {"role": "system", "content": self._get_repair_prompt()},
+                    {"role": "user", "content": f"Fill in these fields:\n\n{requests}"}
+                ],
+                model=self.model,
+                temperature=0.1,
+                max_tokens=600,
+                prompt_version=REPAIR_PROMPT_VERSION
+            ))
+            
+            patch = json.loads(response.text).get("patch", [])
+            patch = patch if isinstance(patch, list) else []
+            data = copy.deepcopy(local_data)
+            applied = apply_patch(data, patch, weak_fields)
+            print(f"Pipeline 3 repair: {applied}/{len(weak_fields)} weak fields patched, "
+                  f"{len(patch) - applied} operations rejected")
+            
+            return CloudResult(
+                # The prompt says never to guess, so an empty patch is a normal answer.
+                success=applied > 0,
+                data=data,
+                confidence=self._calculate_confidence(data),
+                processing_time=time.time() - start_time,
+                cost=response.cost,
+                tokens_used=response.total_tokens,
+                cached=response.cached
+            )
+            
+        except Exception as e:
+            return CloudResult(
+                success=False,
+                data=None,
+                confidence=0.0,
+                processing_time=time.time() - start_time,
+                cost=0.0,
+                error=str(e)
+            )
+    
     def _get_system_prompt(self) -> str:
         return """You are an expert resume parser. Extract ALL information into JSON format.
 
@@ -132,6 +188,7 @@ CRITICAL RULES:
 - Group skills by logical categories (Programming, Tools, etc.)
 - Parse dates correctly (year/month format)
 - Preserve all bullet points in paragraphs arrays
+- Do NOT extract email, phone number or links; they are filled in separately
 
 Return valid JSON matching the exact schema provided."""
 
@@ -152,6 +209,24 @@ MAINTAIN:
 
 Return enhanced JSON with improvements."""
 
+    def _get_repair_prompt(self) -> str:
+        return """You fill in missing fields of a resume extraction.
+
+For each PATH, read its RESUME TEXT and return a JSON Patch operation
+{"op": "replace", "path": <PATH>, "value": <value>}. Leave a field out if the
+text does not contain it; never guess.
+
+VALUE FORMATS:
+- name, role, organization, school_name: string
+- start_date, end_date: {"year": 2023, "month": 8} (month may be null)
+- degree: {"study": "Computer Science", "type": "bachelors"}; type is one of
+  high_school, ged, bachelors, masters, phd, other_college_level,
+  other_high_school_level, other
+- skills: list of {"type": "technical" | "transferable" | "other",
+  "category": string, "keywords": [string]}
+
+Return {"patch": [...]} and nothing else."""
+
     def _validate_structure(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Ensure data matches required schema"""
         defaults = {
@@ -211,14 +286,3 @@ Return enhanced JSON with improvements."""
         scores.append(min(1.0, len(data.get("skills", [])) / 3))
         
         return sum(scores) / len(scores)
-    
-    def _calculate_cost(self, usage) -> float:
-        """Calculate OpenAI API cost"""
-        if not usage:
-            return 0.0
-        
-        # GPT-4o-mini pricing
-        input_cost = (usage.prompt_tokens / 1_000_000) * 0.15
-        output_cost = (usage.completion_tokens / 1_000_000) * 0.60
-        
-        return input_cost + output_cost
\ No newline at end of file
@@ -0,0 +1,195 @@
+"""
+Incremental JSON checking for streamed local model output.
+
+The validator is fed text as the model generates it and follows the JSON
+grammar one character at a time, so output that can no longer become a valid
+object is rejected at the first bad character instead of after the whole
+generation. It reports when the top-level object closes, which is the moment
+to stop the model, and it rejects output that keeps repeating the same text.
+"""
+
+import re
+from typing import List
+
+# Output before the object ("Here is the JSON:", a ``` fence) is tolerated up to this many characters.
+MAX_PREAMBLE_CHARS = 200
+# Output ending in the same stretch this many times back to back, where the
+# repeated text is at least REPEAT_WINDOW characters, means the model is
+# looping. Repeats that are not back to back are normal: pretty-printed items
+# with the same null fields share long runs of identical text.
+REPEAT_WINDOW = 120
+MAX_REPEATS = 3
+
+_VALUE = "value"
+_VALUE_OR_END = "value or ]"
+_KEY = "key"
+_KEY_OR_END = "key or }"
+_COLON = ":"
+_COMMA_OR_END = ", or end"
+
+_LITERAL_CHARS = set("-+.0123456789eEtruefalsn")
+_LITERAL = re.compile(r"-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][+-]?\d+)?|true|false|null")
+_ESCAPES = set('"\\/bfnrtu')
+_HEX = set("0123456789abcdefABCDEF")
+
+
+class JSONStreamError(ValueError):
+    pass
+
+
+class JSONRepetitionError(JSONStreamError):
+    pass
+
+
+class IncrementalJSONValidator:
+    def __init__(self):
+        self.done = False
+        self._parts: List[str] = []
+        self._length = 0
+        self._checked_at = 0
+        self._preamble = 0
+        self._started = False
+        self._stack: List[str] = []
+        self._expect = _VALUE
+        self._in_string = False
+        self._string_is_key = False
+        self._escape = False
+        self._hex_left = 0
+        self._literal = ""
+
+    @property
+    def text(self) -> str:
+        """The object so far, without any preamble"""
+        return "".join(self._parts)
+
+    def feed(self, chunk: str) -> bool:
+        """Check the next piece of output; True once the top-level object is closed"""
+        if self.done:
+            return True
+        start = None
+        for i, c in enumerate(chunk):
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    start = i
+                else:
+                    self._preamble += 1
+                    if self._preamble > MAX_PREAMBLE_CHARS:
+                        raise JSONStreamError("no JSON object in the first "
+                                              f"{MAX_PREAMBLE_CHARS} characters")
+                    continue
+            self._step(c)
+            if self.done:
+                self._append(chunk[start or 0:i + 1])
+                return True
+        if self._started:
+            self._append(chunk[start or 0:])
+            self._check_repetition()
+        return False
+
+    def _append(self, text: str):
+        self._parts.append(text)
+        self._length += len(text)
+
+    def _check_repetition(self):
+        # Searching is linear in the output, so only look again after a window's worth of new text.
+        if self._length - self._checked_at < REPEAT_WINDOW:
+            return
+        self._checked_at = self._length
+        text = self.text
+        # The closest earlier copy of the tail gives the loop's period, if any.
+        previous = text.rfind(text[-REPEAT_WINDOW:], 0, len(text) - 1)
+        if previous < 0:
+            return
+        period = len(text) - REPEAT_WINDOW - previous
+        unit = text[-period:]
+        if text.endswith(unit * MAX_REPEATS):
+            raise JSONRepetitionError(f"output repeats the same {period} characters {MAX_REPEATS} times in a row")
+
+    def _step(self, c: str):
+        if self._in_string:
+            self._string_char(c)
+            return
+        if self._literal:
+            if c in _LITERAL_CHARS and len(self._literal) < 32:
+                self._literal += c
+                return
+            if not _LITERAL.fullmatch(self._literal):
+                raise JSONStreamError(f"invalid literal {self._literal!r}")
+            self._literal = ""
+            self._after_value()
+        if c in " \t\r\n":
+            return
+
+        expect = self._expect
+        if expect in (_VALUE, _VALUE_OR_END):
+            if c == "{":
+                self._stack.append("{")
+                self._expect = _KEY_OR_END
+            elif c == "[":
+                self._stack.append("[")
+                self._expect = _VALUE_OR_END
+            elif c == '"':
+                self._in_string = True
+                self._string_is_key = False
+            elif c in "-0123456789tfn":
+                self._literal = c
+            elif c == "]" and expect == _VALUE_OR_END:
+                self._close()
+            else:
+                self._unexpected(c)
+        elif expect in (_KEY, _KEY_OR_END):
+            if c == '"':
+                self._in_string = True
+                self._string_is_key = True
+            elif c == "}" and expect == _KEY_OR_END:
+                self._close()
+            else:
+                self._unexpected(c)
+        elif expect == _COLON:
+            if c != ":":
+                self._unexpected(c)
+            self._expect = _VALUE
+        else:
+            top = self._stack[-1]
+            if c == ",":
+                self._expect = _KEY if top == "{" else _VALUE
+            elif (c == "}" and top == "{") or (c == "]" and top == "["):
+                self._close()
+            else:
+                self._unexpected(c)
+
+    def _string_char(self, c: str):
+        if self._hex_left:
+            if c not in _HEX:
+                raise JSONStreamError(f"invalid unicode escape character {c!r}")
+            self._hex_left -= 1
+        elif self._escape:
+            if c not in _ESCAPES:
+                raise JSONStreamError(f"invalid escape \\{c}")
+            self._escape = False
+            if c == "u":
+                self._hex_left = 4
+        elif c == "\\":
+            self._escape = True
+        elif c == '"':
+            self._in_string = False
+            if self._string_is_key:
+                self._expect = _COLON
+            else:
+                self._after_value()
+        elif ord(c) < 0x20:
+            raise JSONStreamError("unescaped control character in string")
+
+    def _close(self):
+        self._stack.pop()
+        self._after_value()
+
+    def _after_value(self):
+        if self._stack:
+            self._expect = _COMMA_OR_END
+        else:
+            self.done = True
+
+    def _unexpected(self, c: str):
+        raise JSONStreamError(f"expected {self._expect}, got {c!r}")
@@ -3,12 +3,50 @@ Local processor using Ollama + Llama 3.2 on M1 Mac.
 Handles 80% of the processing for cost savings with good accuracy.
 """
 
+import asyncio
 import json
 import time
-import os
-import requests
 from dataclasses import dataclass
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
+
+from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import llm_gateway
+from app.llm.ollama_pool import OllamaHostPool, ollama_pool
+from app.parser.rules import apply_rules, extract_rules
+from .json_stream import IncrementalJSONValidator, JSONRepetitionError, JSONStreamError
+from .output_schema import resume_output_schema, section_output_schema
+from .scheduler import LocalOverloaded, local_scheduler
+
+# Bump whenever the prompts below change. With structured output the shape
+# comes from the schema, so the prompt carries no JSON example, and the fixed
+# instructions go first as the system prompt so Ollama can reuse their KV cache.
+if not EnvironmentVars.OLLAMA_STRUCTURED_OUTPUT:
+    PROMPT_VERSION = "pipeline3-local-v1"
+elif EnvironmentVars.OLLAMA_SECTION_FANOUT:
+    PROMPT_VERSION = "pipeline3-local-sections-v1"
+else:
+    PROMPT_VERSION = "pipeline3-local-v3"
+
+# Resume fields each kind of section is extracted into; anything else
+# (summary, awards, ...) goes into the free-text paragraphs.
+SECTION_FIELDS = {
+    "contact": ("personal_info",),
+    "education": ("education_items",),
+    "work": ("experience_items",),
+    "volunteer": ("experience_items",),
+    "projects": ("experience_items",),
+    "activities": ("experience_items",),
+    "skills": ("skills",),
+    "coursework": ("relevant_coursework",),
+}
+OTHER_SECTION_FIELDS = ("paragraphs",)
+
+# Token estimates for bounding the answer with num_predict: about four
+# characters per token, and the JSON answer is up to OUTPUT_RATIO times the
+# text it came from.
+CHARS_PER_TOKEN = 4
+OUTPUT_RATIO = 1.5
+OUTPUT_MIN_TOKENS = 256
 
 @dataclass
 class LocalResult:
@@ -16,60 +54,216 @@ class LocalResult:
     data: Optional[Dict[str, Any]]
     confidence: float
     processing_time: float
+    tokens_used: int = 0
     error: Optional[str] = None
+    # Turned away by the scheduler without running
+    shed: bool = False
 
 class LocalProcessor:
-    def __init__(self, host: str = None):
-        # Use environment variable or default
-        self.host = host or os.getenv("OLLAMA_HOST", "http://localhost:11434")
+    def __init__(self, pool: OllamaHostPool = ollama_pool):
+        # Generations go to the least busy healthy host in the pool
+        self.pool = pool
         self.model = "llama3.2:3b-instruct-q4_0"
-        print(f"LocalProcessor connecting to: {self.host}")  # Debug log
+        self.structured = EnvironmentVars.OLLAMA_STRUCTURED_OUTPUT
+        # Section fan-out needs the schema to pin each call to its fields.
+        self.fan_out = self.structured and EnvironmentVars.OLLAMA_SECTION_FANOUT
+        # Ollama reloads the model whenever num_ctx changes, so the warm-up and
+        # every generation use one size per mode; num_predict bounds each answer.
+        self.num_ctx = EnvironmentVars.OLLAMA_SECTION_NUM_CTX if self.fan_out else EnvironmentVars.OLLAMA_NUM_CTX
+        self.options = {
+            "temperature": 0.1,
+            "num_ctx": self.num_ctx
+        }
+        print(f"LocalProcessor using Ollama hosts: {', '.join(self.pool.urls)}")  # Debug log
+        # How streamed generations ended
+        self.streams = {"completed": 0, "invalid": 0, "repeating": 0}
+        # Completed generations, and those whose JSON could not be used
+        self.parsed = 0
+        self.parse_failures = 0
+        self.tokens = 0
+        self.resumes = 0
+        # Prompts that left less than OUTPUT_MIN_TOKENS of the context for the answer
+        self.context_overflows = 0
         
-    async def process(self, text: str) -> LocalResult:
+    async def process(self, text: str, deadline: Optional[float] = None) -> LocalResult:
+        """Parse with the local model; deadline (time.monotonic()) bounds the queue wait"""
         start_time = time.time()
+        self.resumes += 1
         
         try:
             prompt = self._create_prompt(text)
-            response = requests.post(
-                f"{self.host}/api/generate",
-                json={
-                    "model": self.model,
-                    "prompt": prompt,
-                    "stream": False,
-                    "options": {
-                        "temperature": 0.1,
-                        "num_ctx": 4096
-                    }
-                },
-                timeout=30
-            )
+            data, response = await self._generate(prompt, resume_output_schema(), deadline, "resume")
+            return self._result(data, text, response.total_tokens, start_time)
             
-            if response.status_code != 200:
-                raise Exception(f"Ollama error: {response.status_code}")
-            
-            result = response.json()
-            generated = result.get('response', '')
-            
-            data = self._parse_response(generated)
-            confidence = self._calculate_confidence(data, text)
+        except Exception as e:
+            return self._failure(e, start_time)
+    
+    async def process_sections(
+        self, chunks: List[Tuple[str, str]], text: str, deadline: Optional[float] = None
+    ) -> LocalResult:
+        """Parse each section as its own generation, concurrently, and merge the parts"""
+        start_time = time.time()
+        self.resumes += 1
+        
+        try:
+            prompts = [(name, f"RESUME SECTION ({name}):\n{chunk}") for name, chunk in chunks]
+            tasks = [
+                asyncio.ensure_future(self._generate(
+                    prompt,
+                    section_output_schema(SECTION_FIELDS.get(name, OTHER_SECTION_FIELDS)),
+                    deadline,
+                    "section"
+                ))
+                for name, prompt in prompts
+            ]
+            try:
+                # A missing section would look like a sparse resume; let the cascade
+                # escalate instead, and free the scheduler and host slots the other
+                # sections hold as soon as one of them fails.
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+                errors = [task.exception() for task in done if task.exception() is not None]
+                if errors:
+                    raise errors[0]
+            finally:
+                for task in tasks:
+                    task.cancel()
+            results = [task.result() for task in tasks]
             
-            return LocalResult(
-                success=True,
-                data=data,
-                confidence=confidence,
-                processing_time=time.time() - start_time
-            )
+            data = self._merge_sections([(name, data) for (name, _), (data, _) in zip(prompts, results)])
+            tokens = sum(response.total_tokens for _, response in results)
+            return self._result(data, text, tokens, start_time)
             
         except Exception as e:
-            return LocalResult(
-                success=False,
-                data=None,
-                confidence=0.0,
-                processing_time=time.time() - start_time,
-                error=str(e)
-            )
+            return self._failure(e, start_time)
+    
+    async def _generate(
+        self, prompt: str, schema: Dict[str, Any], deadline: Optional[float], kind: str
+    ) -> Tuple[Dict[str, Any], Any]:
+        """One streamed generation, stopped as soon as its JSON closes or goes bad"""
+        validator = IncrementalJSONValidator()
+        failure = []
+        
+        def on_text(piece: str) -> bool:
+            try:
+                return validator.feed(piece)
+            except JSONStreamError as e:
+                failure.append(e)
+                return True
+        
+        response = await local_scheduler.run(
+            lambda: self.pool.run(lambda host: llm_gateway.ollama(
+                prompt,
+                model=self.model,
+                options={**self.options, "num_predict": self._num_predict(prompt)},
+                host=host,
+                on_text=on_text,
+                format=schema if self.structured else None,
+                system=self._system_prompt(),
+                keep_alive=EnvironmentVars.OLLAMA_KEEP_ALIVE
+            )),
+            deadline,
+            kind
+        )
+        self.tokens += response.total_tokens
+        
+        if failure:
+            self.streams["repeating" if isinstance(failure[0], JSONRepetitionError) else "invalid"] += 1
+            self.parse_failures += 1
+            raise failure[0]
+        self.streams["completed"] += 1
+        
+        return self._parse_response(validator.text if validator.done else response.text), response
+    
+    def _result(self, data: Dict[str, Any], text: str, tokens: int, start_time: float) -> LocalResult:
+        apply_rules(data, extract_rules(text), text)
+        return LocalResult(
+            success=True,
+            data=data,
+            confidence=self._calculate_confidence(data, text),
+            processing_time=time.time() - start_time,
+            tokens_used=tokens
+        )
+    
+    def _failure(self, e: Exception, start_time: float) -> LocalResult:
+        return LocalResult(
+            success=False,
+            data=None,
+            confidence=0.0,
+            processing_time=time.time() - start_time,
+            error=str(e),
+            shed=isinstance(e, LocalOverloaded)
+        )
+    
+    def _estimate_tokens(self, prompt: str) -> int:
+        return (len(self._system_prompt() or "") + len(prompt)) // CHARS_PER_TOKEN
+    
+    def _num_predict(self, prompt: str) -> int:
+        """Room for the answer this prompt needs, kept inside the context instead of shifting it"""
+        room = self.num_ctx - self._estimate_tokens(prompt)
+        if room < OUTPUT_MIN_TOKENS:
+            self.context_overflows += 1
+        answer = int(len(prompt) // CHARS_PER_TOKEN * OUTPUT_RATIO)
+        return max(OUTPUT_MIN_TOKENS, min(room, answer))
+    
+    def _merge_sections(self, parts: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Splice section results into one resume; the contact block owns personal info"""
+        merged: Dict[str, Any] = {}
+        for name, data in sorted(parts, key=lambda part: part[0] != "contact"):
+            personal = data.get("personal_info") or {}
+            if personal.get("name") and personal["name"] != "Unknown":
+                merged["personal_info"] = personal
+                break
+        for name, data in parts:
+            for field in SECTION_FIELDS.get(name, OTHER_SECTION_FIELDS):
+                if field != "personal_info":
+                    merged.setdefault(field, []).extend(data.get(field) or [])
+        return self._validate_structure(merged)
+    
+    async def warm_up(self, host: str):
+        """Load the model on a host and pin it in memory, with the system prompt already evaluated"""
+        await llm_gateway.ollama(
+            self._create_prompt(""),
+            model=self.model,
+            options={**self.options, "num_predict": 1},
+            host=host,
+            system=self._system_prompt(),
+            keep_alive=EnvironmentVars.OLLAMA_KEEP_ALIVE,
+            timeout=EnvironmentVars.OLLAMA_WARMUP_TIMEOUT_SECONDS
+        )
+    
+    def stats(self) -> Dict[str, Any]:
+        generations = self.parsed + self.parse_failures
+        return {
+            "structured_output": self.structured,
+            "section_fan_out": self.fan_out,
+            "prompt_version": PROMPT_VERSION,
+            "streams": dict(self.streams),
+            "generations": generations,
+            "parse_failures": self.parse_failures,
+            "parse_failure_rate": self.parse_failures / generations if generations else 0.0,
+            "tokens_per_resume": self.tokens / self.resumes if self.resumes else 0.0,
+            "num_ctx": self.num_ctx,
+            "context_overflows": self.context_overflows,
+        }
+    
+    def _system_prompt(self) -> Optional[str]:
+        if not self.structured:
+            return None
+        return """Extract the information in the resume you are given as JSON.
+
+Rules:
+- Copy names, titles and bullet points exactly as written; one paragraphs entry per bullet.
+- Dates are {"year": 2024, "month": 1}; month is null when not given, the date is null when absent.
+- Experience type is work, volunteer, project or other.
+- Group skills by category (Programming, Tools, ...).
+- Use null for anything the resume does not say. Email, phone number and links are filled in separately."""
     
     def _create_prompt(self, text: str) -> str:
+        if not self.structured:
+            return self._create_example_prompt(text)
+        return f"RESUME:\n{text}"
+
+    def _create_example_prompt(self, text: str) -> str:
         return f"""Extract resume information into JSON format.
 
 RESUME:
@@ -79,10 +273,7 @@ Extract into this exact JSON structure:
 {{
   "personal_info": {{
     "name": "Full Name",
-    "email": "email@domain.com",
-    "phone_number": "phone or null",
-    "home_address": {{"city": "City", "state": "State", "zip_code": null}},
-    "links": ["linkedin", "github", "other"]
+    "home_address": {{"city": "City", "state": "State", "zip_code": null}}
   }},
   "education_items": [
     {{
@@ -115,24 +306,29 @@ Extract into this exact JSON structure:
   "paragraphs": []
 }}
 
-Extract ALL information. Use null for missing data. Return only valid JSON:"""
+Extract ALL information. Use null for missing data. Do NOT extract email, phone number or links; they are filled in separately. Return only valid JSON:"""
 
     def _parse_response(self, response: str) -> Dict[str, Any]:
+        # A failure here fails the local result, so the cascade escalates
+        # instead of repairing an empty structure.
         try:
             # Find JSON in response
             start = response.find('{')
             end = response.rfind('}') + 1
             
             if start == -1 or end == 0:
-                return self._get_empty_structure()
+                raise ValueError("no JSON object in response")
             
             json_str = response[start:end]
             data = json.loads(json_str)
-            
-            return self._validate_structure(data)
-            
-        except:
-            return self._get_empty_structure()
+            if not isinstance(data, dict):
+                raise ValueError("response is not a JSON object")
+        except ValueError:
+            self.parse_failures += 1
+            raise
+        
+        self.parsed += 1
+        return self._validate_structure(data)
     
     def _validate_structure(self, data: Dict[str, Any]) -> Dict[str, Any]:
         # Ensure required keys exist
@@ -179,14 +375,3 @@ Extract ALL information. Use null for missing data. Return only valid JSON:"""
         scores.append(skills_score)
         
         return sum(scores) / len(scores)
-    
-    def _get_empty_structure(self) -> Dict[str, Any]:
-        return {
-            "personal_info": {"name": "Unknown", "email": None, "phone_number": None,
-                            "home_address": {"city": None, "state": None, "zip_code": None}, "links": []},
-            "education_items": [],
-            "experience_items": [],
-            "skills": [],
-            "relevant_coursework": [],
-            "paragraphs": []
-        }
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+JSON Schema for constrained decoding of the local model's output.
+
+Ollama compiles the schema passed as `format` into a grammar, so the model can
+only produce JSON of this shape. The schema is derived from the Resume model
+with the database bookkeeping fields and the fields filled in by rules
+(email, phone number, links) removed, every $ref inlined, and every property
+required so the output always has the same keys. Section-by-section
+extraction uses the same schema cut down to the fields of one section.
+"""
+
+from functools import lru_cache
+from typing import Any, Dict, Tuple
+
+from app.model.schema.resume.together import Resume
+
+# Per object title: properties the model should not produce.
+OMITTED_PROPERTIES = {
+    "Resume": {"_id", "revision_id", "content_hash", "pipeline", "pipeline_version"},
+    "ResumePersonalInfo": {"email", "phone_number", "links"},
+    "ResumeExperienceItem": {"links"},
+}
+# Keys that only describe the schema; the grammar does not need them.
+_DROPPED_KEYS = {"title", "default", "example", "description"}
+
+
+def _inline(node: Any, defs: Dict[str, Any]) -> Any:
+    if isinstance(node, list):
+        return [_inline(item, defs) for item in node]
+    if not isinstance(node, dict):
+        return node
+    if "$ref" in node:
+        return _inline(defs[node["$ref"].rsplit("/", 1)[-1]], defs)
+
+    omitted = OMITTED_PROPERTIES.get(node.get("title"), set())
+    result = {}
+    for key, value in node.items():
+        if key in _DROPPED_KEYS or key == "$defs":
+            continue
+        if key == "properties":
+            result[key] = {name: _inline(prop, defs) for name, prop in value.items() if name not in omitted}
+        else:
+            result[key] = _inline(value, defs)
+    if "properties" in result:
+        result["required"] = list(result["properties"])
+    return result
+
+
+@lru_cache(maxsize=1)
+def resume_output_schema() -> Dict[str, Any]:
+    schema = Resume.model_json_schema()
+    return _inline(schema, schema.get("$defs", {}))
+
+
+@lru_cache(maxsize=None)
+def section_output_schema(fields: Tuple[str, ...]) -> Dict[str, Any]:
+    """The Resume schema cut down to the fields one section is extracted into"""
+    properties = resume_output_schema()["properties"]
+    return {
+        "type": "object",
+        "properties": {field: properties[field] for field in fields},
+        "required": list(fields),
+    }
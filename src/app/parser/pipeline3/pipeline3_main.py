@@ -1,19 +1,29 @@
 """
 Pipeline 3 Main - Hybrid local + cloud orchestrator.
-Combines M1 Llama processing with OpenAI validation for 95%+ accuracy at low cost.
+Runs M1 Llama processing first and escalates to OpenAI only when the router
+says the document or the local result needs it.
 """
 
-import time
 import asyncio
+import time
 from dataclasses import dataclass
 from fastapi import UploadFile
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple, Union
 
-from app.parser.text_extract import extract_text_from_file
+from app.config.env_vars import EnvironmentVars
+from app.parser.prompt_sections import SectionSlicer
+from app.parser.rules import apply_rules, extract_rules
+from app.parser.ingest import IngestedFile
+from app.parser.text_extract import EXTRACTOR_VERSION, extract_document
 from app.model.schema.resume.together import Resume
-from .router import Router
-from .local import LocalProcessor
-from .cloud import CloudProcessor
+from .router import CLOUD, ESCALATED, HEDGED_BOTH, HEDGED_CLOUD, HEDGED_LOCAL, LOCAL, REPAIRED, Router, RoutingDecision
+from .repair import find_weak_fields
+from .local import LocalResult
+from .cloud import CloudResult
+from .local import PROMPT_VERSION as LOCAL_PROMPT_VERSION, LocalProcessor
+from .cloud import EXTRACT_PROMPT_VERSION as CLOUD_PROMPT_VERSION, REPAIR_PROMPT_VERSION, CloudProcessor
+from .scheduler import local_scheduler
+from .warmup import LocalModelKeeper
 
 @dataclass
 class Pipeline3Result:
@@ -24,62 +34,115 @@ class Pipeline3Result:
     local_confidence: float
     cloud_confidence: float
     method_used: str
+    cache_hits: int = 0
+    # Neither processor succeeded; the resume is the empty fallback structure.
+    fallback: bool = False
 
 class Pipeline3Parser:
+    # Stored with each resume; a stored parse is only reused while it matches.
+    VERSION = f"extract-{EXTRACTOR_VERSION}+{LOCAL_PROMPT_VERSION}+{CLOUD_PROMPT_VERSION}+{REPAIR_PROMPT_VERSION}"
+    
     def __init__(self):
         self.router = Router()
         self.local = LocalProcessor()
         self.cloud = CloudProcessor()
+        self.keeper = LocalModelKeeper(self.local, EnvironmentVars.OLLAMA_RESIDENCY_CHECK_SECONDS)
     
-    async def parse_resume(self, file: UploadFile) -> Pipeline3Result:
+    async def parse_resume(
+        self, file: Union[UploadFile, IngestedFile], hedged: bool = False
+    ) -> Pipeline3Result:
         start_time = time.time()
+        # The local queue budget runs from when the parse started, so extraction
+        # time counts and earlier parses are served first.
+        deadline = time.monotonic() + local_scheduler.queue_budget
         total_cost = 0.0
         total_tokens = 0
         
         # Extract text
-        resume_text = await extract_text_from_file(file)
-        
-        # Get routing decision
-        routing = self.router.decide_route(resume_text)
-        
-        # Process with both local and cloud (hybrid approach)
-        local_task = self.local.process(resume_text)
-        
-        # Use direct cloud processing instead of validation
-        cloud_task = self.cloud.process(resume_text)
-        
-        local_result, cloud_result = await asyncio.gather(
-            local_task, cloud_task, return_exceptions=True
-        )
-        
-        # Handle exceptions
-        if isinstance(local_result, Exception):
-            local_result = None
-        if isinstance(cloud_result, Exception):
-            cloud_result = None
-        
-        # Combine results using weights
-        final_data = self._combine_results(
-            local_result, cloud_result, routing
-        )
+        document = await extract_document(file, structured=EnvironmentVars.STRUCTURED_EXTRACTION)
+        resume_text = document.text
+        
+        # Neither model needs sections the schema has no slot for
+        slicer = SectionSlicer(resume_text, blocks=document.blocks)
+        prompt_text = slicer.for_extraction()
+        
+        # Cascade: local first, cloud only for hard documents or weak local results
+        routing = self.router.decide_route(resume_text, slicer.index)
+        local_result = None
+        cloud_result = None
+        
+        if routing.route == LOCAL and hedged and self.router.cloud_available():
+            local_result, cloud_result = await self._hedged(slicer, prompt_text, routing)
+        elif routing.route == LOCAL:
+            local_result = await self._safe(self._process_local(slicer, prompt_text, deadline))
+            reason = self.router.escalation_reason(local_result)
+            if reason and not self.router.cloud_available():
+                # Better a weak local result than waiting on a cloud call that will fail.
+                routing.reasons.append(f"{reason}, kept: cloud circuit open")
+                self.router.circuit_skips[CLOUD] += 1
+            elif reason:
+                routing.reasons.append(reason)
+                weak_fields = find_weak_fields(local_result.data, resume_text) if local_result else []
+                repaired = None
+                if self.router.should_repair(local_result, weak_fields):
+                    repaired = await self._safe(self.cloud.repair(local_result.data, weak_fields))
+                if repaired and repaired.success:
+                    # Score the patched resume the way the local result was scored.
+                    repaired.confidence = self.local._calculate_confidence(repaired.data, resume_text)
+                    limit = self.router.thresholds.min_local_confidence
+                    if repaired.confidence < limit:
+                        routing.reasons.append(f"repaired confidence {repaired.confidence:.3f} < {limit:.3f}")
+                        repaired.success = False
+                if repaired and repaired.success:
+                    routing.route = REPAIRED
+                    routing.reasons.append(f"{len(weak_fields)} weak fields")
+                    cloud_result = repaired
+                else:
+                    if repaired:
+                        # The repair call was paid for even though its result is dropped.
+                        total_cost += repaired.cost
+                        total_tokens += repaired.tokens_used
+                    routing.route = ESCALATED
+                    cloud_result = await self._safe(self.cloud.process(prompt_text))
+        else:
+            cloud_result = await self._safe(self.cloud.process(prompt_text))
+            if not (cloud_result and cloud_result.success) and self.router.local_available():
+                # A local parse of a hard document still beats the empty fallback.
+                # The cloud attempt used up this parse's queue budget; start a fresh one.
+                routing.reasons.append("cloud failed")
+                local_result = await self._safe(self._process_local(slicer, prompt_text))
+        
+        self.router.record(routing.route)
+        print(f"Pipeline 3 route: {routing.route} (complexity {routing.complexity:.2f}"
+              f"{'; ' + '; '.join(routing.reasons) if routing.reasons else ''})")
+        
+        # Combine results using weights; a repair is already the patched local result
+        if routing.route == REPAIRED:
+            final_data = cloud_result.data
+        else:
+            final_data = self._combine_results(
+                local_result, cloud_result, routing
+            )
         
         # Calculate metrics
         if local_result and hasattr(local_result, 'confidence'):
             local_confidence = local_result.confidence
+            total_tokens += local_result.tokens_used
         else:
             local_confidence = 0.0
             
         if cloud_result and hasattr(cloud_result, 'confidence'):
             cloud_confidence = cloud_result.confidence
             total_cost += cloud_result.cost
+            total_tokens += cloud_result.tokens_used
+            cache_hits = int(cloud_result.cached)
         else:
             cloud_confidence = 0.0
-        
-        # Estimate tokens (local processing doesn't track tokens)
-        total_tokens = len(resume_text.split()) * 2  # Rough estimate
+            cache_hits = 0
         
         # Create resume object with validation
         validated_data = self._validate_structure(final_data)
+        apply_rules(validated_data, extract_rules(resume_text), resume_text)
         resume = Resume.model_validate(validated_data)
         
         processing_time = time.time() - start_time
@@ -91,9 +154,74 @@ class Pipeline3Parser:
             tokens_used=total_tokens,
             local_confidence=local_confidence,
             cloud_confidence=cloud_confidence,
-            method_used="hybrid"
+            method_used=routing.route,
+            cache_hits=cache_hits,
+            fallback=not any(r and r.success for r in (local_result, cloud_result))
         )
     
+    def _process_local(self, slicer: SectionSlicer, prompt_text: str, deadline: Optional[float] = None):
+        """Local parse, fanned out by section when enabled and the sections are trustworthy.
+        
+        deadline (time.monotonic()) is when the generations must have started;
+        the sections of one resume share it.
+        """
+        if self.local.fan_out and slicer.confident:
+            return self.local.process_sections(slicer.chunks(), slicer.full_text, deadline)
+        return self.local.process(prompt_text, deadline)
+    
+    async def _hedged(
+        self, slicer: SectionSlicer, prompt_text: str, routing: RoutingDecision
+    ) -> Tuple[Optional[LocalResult], Optional[CloudResult]]:
+        """Local now, cloud after the hedge delay; the first good result wins"""
+        thresholds = self.router.thresholds
+        # Once the hedge delay is up the cloud starts anyway, so a local parse
+        # that could not start by then is not worth queueing for.
+        deadline = time.monotonic() + thresholds.hedge_delay_seconds
+        local_task = asyncio.ensure_future(self._safe(self._process_local(slicer, prompt_text, deadline)))
+        cloud_task = None
+        results = {}
+        
+        def good(result) -> bool:
+            return bool(result and result.success and result.confidence >= thresholds.hedge_min_confidence)
+        
+        try:
+            done, _ = await asyncio.wait({local_task}, timeout=thresholds.hedge_delay_seconds)
+            if done and good(local_task.result()):
+                routing.route = HEDGED_LOCAL
+                return local_task.result(), None
+            
+            routing.reasons.append(
+                "local slow" if not done else self.router.escalation_reason(local_task.result()) or "local weak"
+            )
+            cloud_task = asyncio.ensure_future(self._safe(self.cloud.process(prompt_text)))
+            pending = {cloud_task} if done else {local_task, cloud_task}
+            if done:
+                results[local_task] = local_task.result()
+            
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    results[task] = task.result()
+                    if good(results[task]):
+                        routing.route = HEDGED_LOCAL if task is local_task else HEDGED_CLOUD
+                        return (results[task], None) if task is local_task else (None, results[task])
+            
+            # Neither cleared the bar; blend whatever came back.
+            routing.route = HEDGED_BOTH
+            return results.get(local_task), results.get(cloud_task)
+        finally:
+            for task in (local_task, cloud_task):
+                if task is not None and not task.done():
+                    task.cancel()
+    
+    async def _safe(self, processing):
+        """A processor result, or None if the processor raised"""
+        try:
+            return await processing
+        except Exception as e:
+            print(f"Pipeline 3 processor error: {e}")
+            return None
+    
     def _validate_structure(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Ensure data matches Pydantic Resume schema exactly"""
         
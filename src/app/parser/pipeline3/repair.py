@@ -0,0 +1,157 @@
+"""
+Field-level repair of local extraction results.
+
+Instead of asking the cloud model for a whole resume again, the weak fields of
+the local result (an "Unknown" name, items without a role, organization or
+dates, an empty skills list) are listed together with the text around them.
+The cloud model answers with a small JSON Patch that only touches those
+fields, and the patch is validated and applied here.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+from pydantic import ValidationError
+
+from app.model.schema.resume.education.degree import ResumeEducationDegree
+from app.model.schema.resume.skills import ResumeSkillsList
+from app.model.schema.resume.time import ResumeTimeMonthYear
+from app.parser.section_parse import normalize_text, segment_resume
+
+CONTEXT_WINDOW = 300
+MAX_CONTEXT_CHARS = 1500
+
+
+@dataclass
+class WeakField:
+    path: str  # JSON Pointer into the resume data, e.g. "/experience_items/2/role"
+    reason: str
+    context: str  # Resume text the value should come from
+
+
+def _string(value: Any) -> str:
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError("expected a non-empty string")
+    return value.strip()
+
+
+def _model(model) -> Callable[[Any], Any]:
+    return lambda value: model.model_validate(value).model_dump(mode="json")
+
+
+# The patch may only write values these accept, keyed by the last path segment.
+VALUE_VALIDATORS: Dict[str, Callable[[Any], Any]] = {
+    "name": _string,
+    "role": _string,
+    "organization": _string,
+    "school_name": _string,
+    "degree": _model(ResumeEducationDegree),
+    "start_date": _model(ResumeTimeMonthYear),
+    "end_date": _model(ResumeTimeMonthYear),
+    "skills": _model(ResumeSkillsList),
+}
+
+
+def _has_year(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("year") is not None
+
+
+def _around(text: str, anchor: Optional[str], fallback: str) -> str:
+    if anchor:
+        position = text.lower().find(anchor.lower())
+        if position >= 0:
+            start = max(0, position - CONTEXT_WINDOW)
+            return text[start:position + len(anchor) + CONTEXT_WINDOW].strip()
+    return fallback[:MAX_CONTEXT_CHARS]
+
+
+def find_weak_fields(data: Dict[str, Any], text: str) -> List[WeakField]:
+    """Fields of a schema-shaped result that are missing or look wrong."""
+    index = segment_resume(normalize_text(text))
+    weak = []
+
+    name = (data.get("personal_info") or {}).get("name")
+    if not name or name == "Unknown":
+        weak.append(WeakField("/personal_info/name", "missing name", index.contact()))
+
+    education_text = index.sections("education") or text
+    for i, item in enumerate(data.get("education_items") or []):
+        school = item.get("school_name")
+        context = _around(text, school, education_text)
+        if not school or school == "Unknown School":
+            weak.append(WeakField(f"/education_items/{i}/school_name", "missing school", context))
+        if not (item.get("degree") or {}).get("study"):
+            weak.append(WeakField(f"/education_items/{i}/degree", "missing degree", context))
+        if not _has_year(item.get("end_date")):
+            weak.append(WeakField(f"/education_items/{i}/end_date", "missing graduation date", context))
+
+    experience_text = "\n".join(
+        index.sections(name) for name in ("work", "volunteer", "projects", "activities")
+    ).strip() or text
+    for i, item in enumerate(data.get("experience_items") or []):
+        context = _around(text, item.get("organization") or item.get("role"), experience_text)
+        if not item.get("role"):
+            weak.append(WeakField(f"/experience_items/{i}/role", "missing role", context))
+        if not item.get("organization"):
+            weak.append(WeakField(f"/experience_items/{i}/organization", "missing organization", context))
+        if not _has_year(item.get("start_date")):
+            weak.append(WeakField(f"/experience_items/{i}/start_date", "missing start date", context))
+
+    if not data.get("skills"):
+        skills_text = index.sections("skills") or text
+        weak.append(WeakField("/skills", "no skills", skills_text[:MAX_CONTEXT_CHARS]))
+
+    return weak
+
+
+def _parse_pointer(path: str) -> List[str]:
+    if not path.startswith("/"):
+        raise ValueError(f"not a JSON Pointer: {path}")
+    return [part.replace("~1", "/").replace("~0", "~") for part in path[1:].split("/")]
+
+
+def _allowed(parts: List[str], weak_paths: List[List[str]]) -> bool:
+    # "/skills/-" (append) is allowed when "/skills" was requested.
+    return any(parts[:len(weak)] == weak for weak in weak_paths)
+
+
+def apply_patch(data: Dict[str, Any], patch: List[Dict[str, Any]], weak_fields: List[WeakField]) -> int:
+    """Apply add/replace operations that target requested fields; returns how many applied."""
+    weak_paths = [_parse_pointer(field.path) for field in weak_fields]
+    applied = 0
+    for operation in patch:
+        try:
+            if operation.get("op") not in ("add", "replace"):
+                raise ValueError(f"unsupported op {operation.get('op')}")
+            parts = _parse_pointer(operation["path"])
+            if not _allowed(parts, weak_paths):
+                raise ValueError(f"path {operation['path']} was not requested")
+
+            key = parts[-1]
+            # List items are validated by the name of the list they go into.
+            field = parts[-2] if key == "-" or key.isdigit() else key
+            validator = VALUE_VALIDATORS.get(field)
+            if validator is None:
+                raise ValueError(f"field {field} cannot be patched")
+
+            value = operation["value"]
+            if field == "skills" and isinstance(value, list) and key == "skills":
+                value = [validator(item) for item in value]
+            else:
+                value = validator(value)
+
+            target = data
+            for part in parts[:-1]:
+                target = target[int(part)] if isinstance(target, list) else target[part]
+            if isinstance(target, list):
+                if key == "-":
+                    target.append(value)
+                else:
+                    target[int(key)] = value
+            else:
+                target[key] = value
+            applied += 1
+        except (KeyError, IndexError, TypeError, ValueError, ValidationError):
+            # The caller reports how many operations were rejected; their values are resume text.
+            continue
+    return applied
@@ -1,17 +1,210 @@
 """
-Router optimized for 95%+ accuracy with minimal cost.
-Uses 80% local processing (M1 Llama) + 20% cloud validation for accuracy boost.
+Cascade router for Pipeline 3.
+
+Cheap complexity features are computed from the extracted text. Documents that
+look hard (very long, many sections, tables, multi-column layouts, lots of
+non-ASCII text) go straight to the cloud model. Everything else is parsed
+locally first and only escalated to the cloud when the local result is missing
+or its confidence is below the threshold. A local result that is only missing
+a few fields is repaired field by field instead of escalated. In hedged mode the cloud model is
+started only if the local one has not answered within a delay, and the first
+good answer wins. A model whose circuit breaker is open is skipped in favour
+of the other one, and a weak local result is kept when the cloud is open.
+
+Thresholds live in a JSON file (routing.json next to this module unless
+PIPELINE3_ROUTING_CONFIG points elsewhere). The file is re-read whenever it
+changes, so cloud spend can be traded against accuracy without a restart.
 """
 
-from dataclasses import dataclass
+import json
+import os
+import re
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import OPENAI, llm_gateway
+from app.llm.ollama_pool import ollama_pool
+from app.parser.section_parse import SectionIndex, normalize_text, segment_resume
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), "routing.json")
+
+LOCAL = "local"
+ESCALATED = "local->cloud"
+REPAIRED = "local+repair"
+CLOUD = "cloud"
+HEDGED_LOCAL = "hedged:local"
+HEDGED_CLOUD = "hedged:cloud"
+HEDGED_BOTH = "hedged:both"
+
+# DOCX table rows are joined with " | "; PDF tables and multi-column layouts
+# keep wide runs of spaces between cells or columns.
+_TABLE_LINE = re.compile(r" \| |\t")
+_COLUMN_GAP = re.compile(r"\S {4,}\S")
+
+
+@dataclass
+class RoutingThresholds:
+    # Escalate when the local result scores below this.
+    min_local_confidence: float = 0.6
+    # Skip local entirely when any of these is exceeded.
+    max_chars: int = 9000
+    max_sections: int = 10
+    max_table_line_ratio: float = 0.2
+    max_column_line_ratio: float = 0.25
+    max_non_ascii_ratio: float = 0.05
+    # Blend weights when both local and cloud results are available.
+    local_weight: float = 0.8
+    cloud_weight: float = 0.2
+    # Hedged mode: start the cloud model after this long without a good local
+    # result, and accept the first result scoring at least hedge_min_confidence.
+    hedge_delay_seconds: float = 2.0
+    hedge_min_confidence: float = 0.6
+    # Patch the weak fields of a low-confidence local result instead of
+    # re-parsing the whole resume in the cloud, up to this many fields.
+    repair_enabled: bool = True
+    max_repair_fields: int = 12
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RoutingThresholds":
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+@dataclass
+class ComplexityFeatures:
+    chars: int
+    sections: int
+    table_line_ratio: float
+    column_line_ratio: float
+    non_ascii_ratio: float
+
 
 @dataclass
 class RoutingDecision:
     local_weight: float = 0.8   # Heavy local processing for cost savings
     cloud_weight: float = 0.2   # Light cloud for accuracy validation
     complexity: float = 0.0
+    route: str = LOCAL
+    features: Optional[ComplexityFeatures] = None
+    reasons: List[str] = field(default_factory=list)
+
+
+def compute_features(text: str, index: Optional[SectionIndex] = None) -> ComplexityFeatures:
+    if index is None:
+        index = segment_resume(normalize_text(text))
+    lines = [line for line in text.split("\n") if line.strip()]
+    line_count = len(lines) or 1
+    return ComplexityFeatures(
+        chars=len(text),
+        sections=len(index.spans),
+        table_line_ratio=sum(1 for line in lines if _TABLE_LINE.search(line)) / line_count,
+        column_line_ratio=sum(1 for line in lines if _COLUMN_GAP.search(line.strip())) / line_count,
+        non_ascii_ratio=sum(1 for c in text if ord(c) > 127) / (len(text) or 1),
+    )
+
 
 class Router:
-    def decide_route(self, text: str) -> RoutingDecision:
-        """Always uses 80/20 split optimized for accuracy + cost"""
-        return RoutingDecision(0.8, 0.2, 0.0)
\ No newline at end of file
+    def __init__(self, config_path: Optional[str] = None):
+        self.config_path = config_path or EnvironmentVars.PIPELINE3_ROUTING_CONFIG or DEFAULT_CONFIG_PATH
+        self._thresholds = RoutingThresholds()
+        self._loaded_mtime: Optional[float] = None
+        self.routes = {LOCAL: 0, REPAIRED: 0, ESCALATED: 0, CLOUD: 0}
+        # Decisions changed because a model's circuit was open
+        self.circuit_skips = {LOCAL: 0, CLOUD: 0}
+        self.reload()
+
+    @property
+    def thresholds(self) -> RoutingThresholds:
+        # One stat() per resume is enough to pick up edits to the file.
+        try:
+            mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            mtime = None
+        if mtime != self._loaded_mtime:
+            self.reload()
+        return self._thresholds
+
+    def reload(self) -> RoutingThresholds:
+        """Re-read the thresholds file, keeping the current values if it is unusable."""
+        try:
+            # Remember the version we tried, so a broken file is reported once.
+            self._loaded_mtime = os.stat(self.config_path).st_mtime
+            with open(self.config_path) as f:
+                self._thresholds = RoutingThresholds.from_dict(json.load(f))
+            print(f"Loaded Pipeline 3 routing thresholds from {self.config_path}")
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Could not load routing thresholds from {self.config_path}: {e}")
+        return self._thresholds
+
+    def decide_route(self, text: str, index: Optional[SectionIndex] = None) -> RoutingDecision:
+        """Local first, unless the text's features say the local model will struggle"""
+        thresholds = self.thresholds
+        features = compute_features(text, index)
+
+        checks = [
+            ("chars", features.chars, thresholds.max_chars),
+            ("sections", features.sections, thresholds.max_sections),
+            ("table_line_ratio", features.table_line_ratio, thresholds.max_table_line_ratio),
+            ("column_line_ratio", features.column_line_ratio, thresholds.max_column_line_ratio),
+            ("non_ascii_ratio", features.non_ascii_ratio, thresholds.max_non_ascii_ratio),
+        ]
+        reasons = [f"{name} {value:.3g} > {limit:.3g}" for name, value, limit in checks if value > limit]
+        # Fraction of each limit used, capped; 1.0 means at least one limit is hit.
+        complexity = max(min(1.0, value / limit) if limit else 1.0 for _, value, limit in checks)
+
+        route = CLOUD if reasons else LOCAL
+        if route == CLOUD and not self.cloud_available() and self.local_available():
+            route = LOCAL
+            reasons.append("cloud circuit open")
+            self.circuit_skips[CLOUD] += 1
+        elif route == LOCAL and not self.local_available() and self.cloud_available():
+            route = CLOUD
+            reasons.append("local circuit open")
+            self.circuit_skips[LOCAL] += 1
+
+        return RoutingDecision(
+            local_weight=thresholds.local_weight,
+            cloud_weight=thresholds.cloud_weight,
+            complexity=complexity,
+            route=route,
+            features=features,
+            reasons=reasons,
+        )
+
+    def local_available(self) -> bool:
+        return ollama_pool.available()
+
+    def cloud_available(self) -> bool:
+        return llm_gateway.available(OPENAI)
+
+    def escalation_reason(self, local_result) -> Optional[str]:
+        """Why a local result needs the cloud model, or None if it is good enough"""
+        if local_result is not None and local_result.shed:
+            return "local queue full"
+        if local_result is None or not local_result.success:
+            return "local failed"
+        limit = self.thresholds.min_local_confidence
+        if local_result.confidence < limit:
+            return f"local confidence {local_result.confidence:.3f} < {limit:.3f}"
+        return None
+
+    def should_repair(self, local_result, weak_fields) -> bool:
+        """Whether a weak local result can be patched instead of re-parsed"""
+        thresholds = self.thresholds
+        return bool(
+            thresholds.repair_enabled
+            and local_result is not None and local_result.success
+            and 0 < len(weak_fields) <= thresholds.max_repair_fields
+        )
+    
+    def record(self, route: str):
+        self.routes[route] = self.routes.get(route, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "config_path": self.config_path,
+            "thresholds": asdict(self._thresholds),
+            "routes": dict(self.routes),
+            "circuit_skips": dict(self.circuit_skips),
+        }
@@ -0,0 +1,168 @@
+"""
+Admission scheduler for local model generations.
+
+Ollama runs OLLAMA_NUM_PARALLEL generations at once and queues the rest
+internally, where a burst of resumes waits until the HTTP timeout and then
+falls back to the cloud anyway. This scheduler keeps that queue in process
+instead: at most `parallelism` generations per usable Ollama host (healthy,
+circuit not open) are in flight, waiting requests are started in deadline
+order, and a request is turned away at once when its predicted wait exceeds
+its deadline, so the cloud model can start on it straight away instead of
+after a timeout. The wait is predicted from the work queued ahead, using a
+separate moving average of generation time for each kind of request (whole
+resumes, single sections).
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.config.env_vars import EnvironmentVars
+from app.llm.ollama_pool import ollama_pool
+
+T = TypeVar("T")
+
+# Service time per kind of request, assumed until real generations have been measured.
+INITIAL_SERVICE_SECONDS = {"resume": 10.0, "section": 2.5}
+DEFAULT_KIND = "resume"
+# Weight of the newest measurement in the moving average.
+SERVICE_SMOOTHING = 0.2
+
+
+class LocalOverloaded(Exception):
+    pass
+
+
+@dataclass(order=True)
+class _Waiter:
+    deadline: float
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    cost: float = field(compare=False, default=0.0)
+
+
+class LocalScheduler:
+    def __init__(self, parallelism_per_host: int, queue_budget: float, hosts: Callable[[], int] = lambda: 1):
+        self.parallelism_per_host = max(1, parallelism_per_host)
+        self._hosts = hosts
+        self.queue_budget = queue_budget
+        self.service_seconds = dict(INITIAL_SERVICE_SECONDS)
+        self._in_flight = 0
+        # Expected seconds of the generations running now
+        self._running_cost = 0.0
+        self._waiting: List[_Waiter] = []
+        self._seq = itertools.count()
+        self.admitted = 0
+        self.shed_predicted = 0
+        self.shed_expired = 0
+        self.queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def parallelism(self) -> int:
+        # With every host ejected, one slot keeps requests failing fast instead of queueing.
+        return self.parallelism_per_host * max(1, self._hosts())
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for waiter in self._waiting if not waiter.future.done())
+
+    def estimated_wait(self, deadline: float) -> float:
+        """Seconds until a request with this deadline would start"""
+        if self._in_flight < self.parallelism:
+            return 0.0
+        # Running generations are on average half done.
+        ahead = sum(w.cost for w in self._waiting if not w.future.done() and w.deadline <= deadline)
+        return (self._running_cost / 2 + ahead) / self.parallelism
+
+    async def run(
+        self, work: Callable[[], Awaitable[T]], deadline: Optional[float] = None, kind: str = DEFAULT_KIND
+    ) -> T:
+        """Run work once a slot is free, or raise LocalOverloaded if that would be after the deadline"""
+        arrived = time.monotonic()
+        deadline = deadline or arrived + self.queue_budget
+        wait = self.estimated_wait(deadline)
+        if arrived + wait > deadline:
+            self.shed_predicted += 1
+            raise LocalOverloaded(f"local queue wait of about {wait:.1f}s is past the deadline")
+
+        cost = self.service_seconds.setdefault(kind, INITIAL_SERVICE_SECONDS[DEFAULT_KIND])
+        await self._acquire(deadline, cost)
+        started = time.monotonic()
+        self._running_cost += cost
+        self.admitted += 1
+        self.total_wait += started - arrived
+        self.max_wait = max(self.max_wait, started - arrived)
+        try:
+            return await work()
+        finally:
+            elapsed = time.monotonic() - started
+            self._running_cost -= cost
+            self.service_seconds[kind] += SERVICE_SMOOTHING * (elapsed - self.service_seconds[kind])
+            self._release()
+
+    async def _acquire(self, deadline: float, cost: float):
+        if self._in_flight < self.parallelism and not self.queue_depth:
+            self._in_flight += 1
+            return
+
+        waiter = _Waiter(deadline, next(self._seq), asyncio.get_running_loop().create_future(), cost)
+        heapq.heappush(self._waiting, waiter)
+        self.queued += 1
+        # Slots may have appeared since the last release (a host was readmitted).
+        self._dispatch()
+        try:
+            await asyncio.wait({waiter.future}, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        if not waiter.future.done():
+            self._abandon(waiter)
+            self.shed_expired += 1
+            raise LocalOverloaded("deadline passed while waiting for the local model")
+
+    def _abandon(self, waiter: _Waiter):
+        if waiter.future.done():
+            # The slot was handed over just as the waiter gave up; pass it on.
+            self._release()
+        else:
+            waiter.future.cancel()
+
+    def _release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Start waiters in deadline order while there are free slots"""
+        # After a host is ejected there can be more generations in flight than slots.
+        while self._waiting and self._in_flight < self.parallelism:
+            waiter = heapq.heappop(self._waiting)
+            if not waiter.future.done():
+                self._in_flight += 1
+                waiter.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "parallelism": self.parallelism,
+            "in_flight": self._in_flight,
+            "queue_depth": self.queue_depth,
+            "queue_budget_seconds": self.queue_budget,
+            "service_seconds": dict(self.service_seconds),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "shed_predicted": self.shed_predicted,
+            "shed_expired": self.shed_expired,
+            "avg_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+local_scheduler = LocalScheduler(
+    parallelism_per_host=EnvironmentVars.OLLAMA_NUM_PARALLEL,
+    queue_budget=EnvironmentVars.OLLAMA_QUEUE_BUDGET_SECONDS,
+    hosts=ollama_pool.usable_count,
+)
@@ -0,0 +1,83 @@
+"""
+Keeps the local model loaded in Ollama.
+
+Loading llama3.2 takes long enough that a cold first request times out and
+silently goes to the cloud. At startup a tiny generation loads the model with
+keep_alive so it stays pinned on every Ollama host, then each host is checked
+periodically and the model is loaded again if it was evicted (an Ollama
+restart, another model taking the memory). `ready` is what the readiness
+probe reports: true once the model is resident on a healthy host.
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from app.config.env_vars import EnvironmentVars
+from app.llm.gateway import llm_gateway
+from .local import LocalProcessor
+
+MIN_RETRY_SECONDS = 1.0
+
+
+class LocalModelKeeper:
+    def __init__(self, local: LocalProcessor, check_seconds: float):
+        self.local = local
+        self.check_seconds = check_seconds
+        self.enabled = EnvironmentVars.OLLAMA_WARMUP
+        self.resident = {host.url: False for host in local.pool.hosts}
+        self.warmups = 0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def ready(self) -> bool:
+        # Nothing to wait for when warm-up is switched off.
+        if not self.enabled:
+            return True
+        return any(host.healthy and self.resident[host.url] for host in self.local.pool.hosts)
+
+    async def start(self):
+        if self.enabled and not self._tasks:
+            self._tasks = [asyncio.create_task(self._keep_resident(url)) for url in self.resident]
+
+    async def end(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _resident(self, host: str) -> bool:
+        return self.local.model in await llm_gateway.ollama_loaded(host)
+
+    async def _keep_resident(self, host: str):
+        retry = MIN_RETRY_SECONDS
+        while True:
+            try:
+                if not await self._resident(host):
+                    self.resident[host] = False
+                    print(f"Loading {self.local.model} into {host}")
+                    await self.local.warm_up(host)
+                    self.warmups += 1
+                self.resident[host] = True
+                retry = MIN_RETRY_SECONDS
+                delay = self.check_seconds
+            except Exception as e:
+                # Ollama may still be starting; retry sooner than the regular check.
+                self.resident[host] = False
+                self.failures += 1
+                self.last_error = f"{host}: {e}"
+                print(f"Local model warm-up on {host} failed: {e}")
+                delay = retry
+                retry = min(self.check_seconds, retry * 2)
+            await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "ready": self.ready,
+            "resident": dict(self.resident),
+            "warmups": self.warmups,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
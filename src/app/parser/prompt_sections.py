@@ -0,0 +1,89 @@
+"""
+Section-sliced prompt text.
+
+Each LLM stage only needs some of the resume: categorizing experiences does
+not need the contact block, and nothing needs the references list. The slicer
+segments the text once and hands each stage the sections it asks for, falling
+back to the full text whenever the segmentation does not look trustworthy.
+With layout blocks from structured extraction, headers are found from
+typography first and by keyword only if that segmentation is not trusted.
+"""
+
+from typing import Iterable, List, Optional, Tuple
+
+from app.config.env_vars import EnvironmentVars
+from app.parser.layout import TextBlock
+from app.parser.section_parse import SCHEMA_SECTIONS, normalize_text, segment_blocks, segment_resume
+
+# Sections no pipeline maps into the Resume schema.
+UNUSED_SECTIONS = ["references"]
+
+# Segmentation is trusted only if it found at least this many schema sections,
+# the text before the first header (the contact block) is not suspiciously
+# long, which would mean headers were missed, and most spans are named
+# sections rather than unrecognised styled lines.
+MIN_SCHEMA_SECTIONS = 2
+MAX_PREAMBLE_RATIO = 0.35
+MAX_OTHER_RATIO = 0.5
+
+
+class SectionSlicer:
+    def __init__(
+        self,
+        text: str,
+        enabled: bool = EnvironmentVars.PROMPT_SECTION_SLICING,
+        blocks: Optional[List[TextBlock]] = None,
+    ):
+        self.full_text = text
+        self.index = segment_blocks(blocks) if blocks else None
+        if self.index is None or not self._is_confident():
+            self.index = segment_resume(normalize_text(text))
+        self.confident = enabled and self._is_confident()
+
+    def _is_confident(self) -> bool:
+        found = [name for name in SCHEMA_SECTIONS if self.index.get(name)]
+        if len(found) < MIN_SCHEMA_SECTIONS:
+            return False
+        other = len(self.index.get("other"))
+        if other > len(self.index.spans) * MAX_OTHER_RATIO:
+            return False
+        preamble = self.index.spans[0].start
+        return preamble <= len(self.index.text) * MAX_PREAMBLE_RATIO
+
+    def select(self, names: Iterable[str], include_contact: bool = False) -> str:
+        """Only the named sections, in document order."""
+        if not self.confident:
+            return self.full_text
+        wanted = set(names)
+        parts = [self.index.contact()] if include_contact else []
+        for span in self.index.spans:
+            if span.name in wanted:
+                parts.append(self.index.text[span.start:span.end].strip())
+        return "\n\n".join(part for part in parts if part)
+
+    def without(self, names: Iterable[str]) -> str:
+        """Everything except the named sections."""
+        if not self.confident:
+            return self.full_text
+        dropped = set(names)
+        end = self.index.spans[0].start
+        parts = [self.index.text[:end].strip()]
+        for span in self.index.spans:
+            if span.name not in dropped:
+                parts.append(self.index.text[span.start:span.end].strip())
+        return "\n\n".join(part for part in parts if part)
+
+    def for_extraction(self) -> str:
+        """Text for stages that extract every schema field."""
+        return self.without(UNUSED_SECTIONS)
+
+    def chunks(self) -> List[Tuple[str, str]]:
+        """(name, text) for the contact block and each extracted section kind."""
+        if not self.confident:
+            return [("document", self.full_text)]
+        contact = self.index.text[:self.index.spans[0].start].strip()
+        parts = [("contact", contact)] if contact else []
+        for name in self.index.names:
+            if name not in UNUSED_SECTIONS:
+                parts.append((name, self.index.sections(name)))
+        return parts
@@ -0,0 +1,277 @@
+"""
+Deterministic extraction of regex-recoverable resume fields.
+
+Email, phone, profile links, GPAs and "May 2023 - Present" style date ranges
+do not need an LLM. They are pulled out here with precompiled patterns (with
+character offsets), the pipelines stop asking the models for the contact
+fields, and the values are merged into the model output afterwards. Dates and
+GPAs are still requested from the models, because assigning them to the right
+item needs the surrounding structure; the deterministic values only fill in
+what the model left empty.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.model.schema.resume.link import ResumeWebLinkPlatform
+from app.model.schema.resume.time import ResumeTimeMonthYear
+from app.parser.section_parse import SectionIndex, segment_resume
+
+EMAIL = re.compile(r"(?<![\w.+-])[A-Za-z0-9._%+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}")
+PHONE = re.compile(
+    r"(?<![\w+])(?:\+?1[\s.-]?)?\(?\d{3}\)?[\s.-]?\d{3}[\s.-]?\d{4}(?!\d)"
+    r"|(?<![\w+])\+\d{1,3}(?:[\s.-]?\d{2,4}){2,5}(?!\d)"
+)
+URL = re.compile(
+    r"(?<![@\w.-])(?P<url>(?P<scheme>https?://)?(?P<www>www\.)?"
+    r"(?P<host>[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.(?:com|io|dev|me|org|net|app|edu|co|ai))"
+    r"(?P<path>/[^\s|,;()<>\"']*)?)",
+    re.IGNORECASE,
+)
+PLATFORM_HOSTS = [
+    ("linkedin.com", ResumeWebLinkPlatform.LINKEDIN),
+    ("github.com", ResumeWebLinkPlatform.GITHUB),
+    ("instagram.com", ResumeWebLinkPlatform.INSTAGRAM),
+    ("facebook.com", ResumeWebLinkPlatform.FACEBOOK),
+    ("fb.com", ResumeWebLinkPlatform.FACEBOOK),
+    ("joinhandshake.com", ResumeWebLinkPlatform.HANDSHAKE),
+]
+
+GPA = re.compile(
+    r"\bGPA\b[^0-9\n]{0,15}(?P<a>\d\.\d{1,3})(?:\s*/\s*(?P<a_scale>\d(?:\.\d+)?))?"
+    r"|(?P<b>\d\.\d{1,3})(?:\s*/\s*(?P<b_scale>\d(?:\.\d+)?))?\s*(?:cumulative\s+|overall\s+)?GPA\b",
+    re.IGNORECASE,
+)
+
+MONTHS = {
+    "jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+    "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12,
+}
+_MONTH = (
+    r"(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|June?|July?|Aug(?:ust)?"
+    r"|Sep(?:t(?:ember)?)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?)\.?"
+)
+_DATE = rf"(?:(?:{_MONTH})\s+|\d{{1,2}}/)?(?:19|20)\d{{2}}"
+DATE = re.compile(rf"(?P<month>{_MONTH})?\s*(?:(?P<num>\d{{1,2}})/)?(?P<year>(?:19|20)\d{{2}})", re.IGNORECASE)
+DATE_RANGE = re.compile(
+    rf"(?P<start>{_DATE})\s*(?:-|–|—|to|until)\s*"
+    rf"(?:(?P<end>{_DATE})|(?P<current>present|current|now|ongoing|today))",
+    re.IGNORECASE,
+)
+
+# How far past an item's anchor text (school name, organization) a date range
+# or GPA may be to be attributed to it.
+ANCHOR_WINDOW = 250
+
+# Sections an experience item's anchor is looked for in, by item type.
+EXPERIENCE_SECTIONS = {"work": ["work"], "volunteer": ["volunteer"], "project": ["projects"]}
+ANY_EXPERIENCE_SECTION = ["work", "volunteer", "projects"]
+
+
+@dataclass
+class TextMatch:
+    value: Any
+    start: int
+    end: int
+
+
+@dataclass
+class LinkMatch:
+    url: str
+    platform: ResumeWebLinkPlatform
+    start: int
+    end: int
+
+
+@dataclass
+class DateRangeMatch:
+    start_date: ResumeTimeMonthYear
+    end_date: Optional[ResumeTimeMonthYear]  # None for "Present"
+    start: int
+    end: int
+
+
+@dataclass
+class RuleExtraction:
+    email: Optional[TextMatch] = None
+    phone: Optional[TextMatch] = None
+    links: List[LinkMatch] = field(default_factory=list)
+    gpas: List[TextMatch] = field(default_factory=list)
+    date_ranges: List[DateRangeMatch] = field(default_factory=list)
+
+
+def link_platform(url: str) -> ResumeWebLinkPlatform:
+    lowered = str(url).lower()
+    for host, platform in PLATFORM_HOSTS:
+        if host in lowered:
+            return platform
+    for platform in ResumeWebLinkPlatform:
+        if lowered == platform.value:
+            return platform
+    return ResumeWebLinkPlatform.OTHER
+
+
+def _parse_date(text: str) -> ResumeTimeMonthYear:
+    match = DATE.search(text)
+    month = None
+    if match.group("month"):
+        month = MONTHS[match.group("month")[:3].lower()]
+    elif match.group("num") and 1 <= int(match.group("num")) <= 12:
+        month = int(match.group("num"))
+    return ResumeTimeMonthYear(year=int(match.group("year")), month=month)
+
+
+def _gpa_value(match: re.Match) -> Optional[float]:
+    value = float(match.group("a") or match.group("b"))
+    scale = match.group("a_scale") or match.group("b_scale")
+    limit = float(scale) if scale else 5.0
+    return value if 0 < value <= limit else None
+
+
+def extract_rules(text: str) -> RuleExtraction:
+    result = RuleExtraction()
+
+    match = EMAIL.search(text)
+    if match:
+        result.email = TextMatch(match.group(0), match.start(), match.end())
+
+    match = PHONE.search(text)
+    if match:
+        result.phone = TextMatch(match.group(0).strip(), match.start(), match.end())
+
+    seen = set()
+    for match in URL.finditer(text):
+        url = match.group("url").rstrip(".")
+        platform = link_platform(url)
+        # Bare domains ("Amazon.com") are only links with a scheme, www. or path.
+        explicit = match.group("scheme") or match.group("www") or match.group("path")
+        if platform == ResumeWebLinkPlatform.OTHER and not explicit:
+            continue
+        if url.lower() in seen:
+            continue
+        seen.add(url.lower())
+        result.links.append(LinkMatch(url, platform, match.start(), match.start() + len(url)))
+
+    for match in GPA.finditer(text):
+        value = _gpa_value(match)
+        if value is not None:
+            result.gpas.append(TextMatch(value, match.start(), match.end()))
+
+    for match in DATE_RANGE.finditer(text):
+        end_date = None if match.group("current") else _parse_date(match.group("end"))
+        result.date_ranges.append(
+            DateRangeMatch(_parse_date(match.group("start")), end_date, match.start(), match.end())
+        )
+
+    return result
+
+
+def apply_rules(data: Dict[str, Any], rules: RuleExtraction, text: str) -> Dict[str, Any]:
+    """Merge deterministic values into schema-shaped resume data in place."""
+    personal = data.get("personal_info")
+    if not isinstance(personal, dict):
+        personal = data["personal_info"] = {"name": "Unknown"}
+
+    if rules.email:
+        personal["email"] = rules.email.value
+    if rules.phone:
+        personal["phone_number"] = rules.phone.value
+    if rules.links:
+        platforms = []
+        for link in rules.links:
+            if link.platform.value not in platforms:
+                platforms.append(link.platform.value)
+        personal["links"] = platforms
+
+    lowered = text.lower()
+    index = segment_resume(text)
+    anchored = []
+    taken = set()
+    for item in data.get("education_items") or []:
+        if isinstance(item, dict):
+            regions = _regions(index, ["education"])
+            anchored.append((item, _find_anchor(lowered, regions, item.get("school_name"), taken), True))
+    for item in data.get("experience_items") or []:
+        if isinstance(item, dict):
+            regions = _regions(index, EXPERIENCE_SECTIONS.get(item.get("type"), ANY_EXPERIENCE_SECTION))
+            anchor = _find_anchor(lowered, regions, item.get("organization"), taken)
+            if anchor is None:
+                anchor = _find_anchor(lowered, regions, item.get("role"), taken)
+            anchored.append((item, anchor, False))
+
+    # An item owns the text from its anchor's line up to the next item's
+    # anchor or the end of its section, whichever comes first.
+    starts = sorted(anchor for _, anchor, _ in anchored if anchor is not None)
+    for item, anchor, education in anchored:
+        if anchor is None:
+            continue
+        window = _window(index, lowered, starts, anchor)
+        if education and item.get("gpa") is None:
+            gpa = _first_in(rules.gpas, window)
+            if gpa:
+                item["gpa"] = gpa.value
+        _fill_dates(item, rules, window)
+
+    return data
+
+
+def _regions(index: SectionIndex, names: List[str]) -> List[Tuple[int, int]]:
+    """(start, end) of the named sections; everything after the contact block if there are none."""
+    regions = [(span.start, span.end) for name in names for span in index.get(name)]
+    if regions:
+        return sorted(regions)
+    return [(index.spans[0].start if index.spans else 0, len(index.text))]
+
+
+def _find_anchor(lowered_text: str, regions: List[Tuple[int, int]], value: Any, taken: set) -> Optional[int]:
+    """First whole-word occurrence of value inside regions that no other item has claimed."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    # Whole words only, so "MIT" is not found inside "Smith" and "Amazon" not
+    # inside "Amazon.com"; lookarounds instead of \b also work for values
+    # ending in punctuation ("C++").
+    pattern = re.compile(r"(?<![\w.])" + re.escape(value.strip().lower()) + r"(?!\w|\.\w)")
+    for start, end in regions:
+        for match in pattern.finditer(lowered_text, start, end):
+            if match.start() not in taken:
+                taken.add(match.start())
+                return match.start()
+    return None
+
+
+def _window(index: SectionIndex, lowered_text: str, starts: List[int], anchor: int) -> Tuple[int, int]:
+    end = min(anchor + ANCHOR_WINDOW, len(lowered_text))
+    for span in index.spans:
+        if span.start <= anchor < span.end:
+            end = min(end, span.end)
+    later = [start for start in starts if start > anchor]
+    if later:
+        end = min(end, later[0])
+    # Dates often lead the line ("2019 - 2021  Amazon"), but never reach back
+    # past the previous item's anchor.
+    line_start = lowered_text.rfind("\n", 0, anchor) + 1
+    earlier = [start for start in starts if start < anchor]
+    return max(line_start, earlier[-1] + 1 if earlier else 0), end
+
+
+def _first_in(matches: list, window: Tuple[int, int]):
+    for match in matches:
+        if window[0] <= match.start < window[1]:
+            return match
+    return None
+
+
+def _has_date(value: Any) -> bool:
+    return isinstance(value, dict) and value.get("year") is not None
+
+
+def _fill_dates(item: Dict[str, Any], rules: RuleExtraction, window: Tuple[int, int]):
+    if _has_date(item.get("start_date")):
+        return
+    date_range = _first_in(rules.date_ranges, window)
+    if not date_range:
+        return
+    item["start_date"] = date_range.start_date.model_dump()
+    if not _has_date(item.get("end_date")):
+        item["end_date"] = date_range.end_date.model_dump() if date_range.end_date else None
@@ -1,95 +1,219 @@
 import re
-from typing import Dict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+# Keyword -> section, in priority order: when a header line holds several
+# keywords ("Volunteer Experience", "Academic Projects") the first listed wins.
+SECTION_KEYWORDS = [
+    ('volunteer', ['VOLUNTEER', 'VOLUNTEERING', 'COMMUNITY', 'SERVICE']),
+    ('projects', ['PROJECTS', 'PROJECT', 'PORTFOLIO']),
+    ('skills', ['SKILLS', 'TECHNOLOGIES']),
+    ('education', ['EDUCATION', 'SCHOOL']),
+    ('work', ['EXPERIENCE', 'WORK', 'EMPLOYMENT']),
+    # Modifiers that only name a section on their own ("Academic", "Technical").
+    ('education', ['ACADEMIC']),
+    ('work', ['PROFESSIONAL', 'RESEARCH']),
+    ('skills', ['TECHNICAL']),
+    # Sections the schema has no slot for; they still end the section before them.
+    ('summary', ['SUMMARY', 'OBJECTIVE', 'PROFILE']),
+    ('certifications', ['CERTIFICATIONS', 'CERTIFICATES', 'LICENSES']),
+    ('awards', ['AWARDS', 'HONORS', 'ACHIEVEMENTS']),
+    ('coursework', ['COURSEWORK', 'COURSES']),
+    ('activities', ['ACTIVITIES', 'LEADERSHIP', 'INVOLVEMENT']),
+    ('publications', ['PUBLICATIONS']),
+    ('languages', ['LANGUAGES']),
+    ('interests', ['INTERESTS', 'HOBBIES']),
+    ('references', ['REFERENCES']),
+]
+SCHEMA_SECTIONS = ['education', 'work', 'volunteer', 'skills', 'projects']
+
+_KEYWORD_SECTION: Dict[str, str] = {}
+_KEYWORD_RANK: Dict[str, int] = {}
+for _rank, (_section, _keywords) in enumerate(SECTION_KEYWORDS):
+    for _keyword in _keywords:
+        _KEYWORD_SECTION.setdefault(_keyword, _section)
+        _KEYWORD_RANK.setdefault(_keyword, _rank)
+
+# One alternation over every keyword, anchored to a short line. The scanner
+# walks the text once; classification then only looks at the matched line.
+_HEADER_LINE = re.compile(
+    r'^[ \t]*(?:[#*\u2022-]+[ \t]*)?'
+    r'(?P<title>[A-Za-z&/ \t]{0,30}?\b(?:'
+    + '|'.join(sorted(_KEYWORD_SECTION, key=len, reverse=True))
+    + r')\b[A-Za-z&/ \t]{0,30}?)[ \t]*:?[ \t]*$',
+    re.IGNORECASE | re.MULTILINE,
+)
+# Words that also turn up in ordinary lines ("Resume Parser Project", "Service
+# Desk Analyst"); on their own they only make a header in caps or with a colon.
+WEAK_KEYWORDS = {'PROJECT', 'SERVICE', 'WORK', 'SCHOOL', 'RESEARCH', 'PROFILE', 'COURSES'}
+_WORD = re.compile(r'[A-Za-z]+')
+_CONNECTORS = {'&', 'AND', '/'}
+
+MAX_HEADER_WORDS = 4
+MAX_CONTACT_LINES = 10
+
+
+@dataclass(frozen=True)
+class SectionSpan:
+    name: str
+    start: int  # offset of the header line
+    end: int  # offset where the next section starts
+    header: str
+
+
+class SectionIndex:
+    """Header offsets found in one pass; every section lookup is a slice."""
+
+    def __init__(self, text: str, spans: List[SectionSpan]):
+        self.text = text
+        self.spans = spans
+        self._by_name: Dict[str, List[SectionSpan]] = {}
+        for span in spans:
+            self._by_name.setdefault(span.name, []).append(span)
+
+    @property
+    def names(self) -> List[str]:
+        return list(self._by_name)
+
+    def get(self, name: str) -> List[SectionSpan]:
+        return self._by_name.get(name, [])
+
+    def section(self, name: str) -> str:
+        """Text of the first section with this name, header line included."""
+        spans = self._by_name.get(name)
+        if not spans:
+            return ""
+        return self.text[spans[0].start:spans[0].end].strip()
+
+    def sections(self, name: str) -> str:
+        """Text of every section with this name, e.g. two experience blocks."""
+        return '\n'.join(
+            self.text[span.start:span.end].strip() for span in self._by_name.get(name, [])
+        )
+
+    def contact(self) -> str:
+        end = self.spans[0].start if self.spans else len(self.text)
+        lines = self.text[:end].strip().split('\n')
+        return '\n'.join(lines[:MAX_CONTACT_LINES])
+
+
+def classify_header(line: str) -> Optional[str]:
+    """Section name for a header line, or None if it does not read as one."""
+    stripped = line.strip().rstrip(':').strip()
+    words = _WORD.findall(stripped)
+    if not words or len(words) > MAX_HEADER_WORDS:
+        return None
+
+    upper = [word.upper() for word in words]
+    ranked = [(_KEYWORD_RANK[word], word) for word in upper if word in _KEYWORD_SECTION]
+    if not ranked:
+        return None
+
+    # Other lines are only headers when they carry a strong keyword and a
+    # keyword ends the line ("Work Experience") or leads a joined title
+    # ("Skills & Interests").
+    strong = any(word not in WEAK_KEYWORDS for _, word in ranked)
+    is_header = (
+        stripped.isupper()
+        or line.rstrip().endswith(':')
+        or (strong and upper[-1] in _KEYWORD_SECTION)
+        or (strong and upper[0] in _KEYWORD_SECTION and any(c in stripped.upper().split() for c in _CONNECTORS))
+    )
+    if not is_header:
+        return None
+    return _KEYWORD_SECTION[min(ranked)[1]]
+
+
+def segment_resume(text: str) -> SectionIndex:
+    """Find every section header in one linear pass over the text."""
+    starts = []
+    for match in _HEADER_LINE.finditer(text):
+        name = classify_header(match.group(0))
+        if name:
+            starts.append((match.start(), name, match.group('title').strip()))
+    return _build_index(text, starts)
+
+
+def segment_blocks(blocks) -> SectionIndex:
+    """Segment layout blocks, using typography to find header lines.
+
+    blocks are app.parser.layout.TextBlock items from structured extraction.
+    """
+    from app.parser.layout import detect_headings
+
+    headings = detect_headings(blocks)
+    offsets = []
+    position = 0
+    for block in blocks:
+        offsets.append(position)
+        position += len(block.text) + 1
+    text = '\n'.join(block.text for block in blocks)
+
+    starts = []
+    for index, block in enumerate(blocks):
+        if index not in headings:
+            continue
+        name = classify_header(block.text + ':')
+        if name is None and (not starts or not headings[index]):
+            # Large or bold lines above the first section (the name) belong to
+            # the contact block; bold-only lines (employers, schools) stay in
+            # the section they are in.
+            continue
+        starts.append((offsets[index], name or 'other', block.text.strip()))
+    return _build_index(text, starts)
+
+
+def _build_index(text: str, starts) -> SectionIndex:
+    spans = []
+    for i, (start, name, header) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else len(text)
+        spans.append(SectionSpan(name=name, start=start, end=end, header=header))
+    return SectionIndex(text, spans)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of spaces/tabs but keep line breaks."""
+    lines = (re.sub(r'[^\S\n]+', ' ', line).strip() for line in text.strip().split('\n'))
+    return '\n'.join(line for line in lines if line)
 
 
 def parse_resume_sections(text: str) -> Dict[str, str]:
     """Split resume text into different sections."""
-    text = re.sub(r'\s+', ' ', text.strip())
-    
+    index = segment_resume(normalize_text(text))
+
     sections = {}
-    sections['personal'] = get_contact_info(text)
-    sections['education'] = find_education_section(text)
-    sections['work'] = find_work_section(text)  
-    sections['volunteer'] = find_volunteer_section(text)
-    sections['skills'] = find_skills_section(text)
-    sections['projects'] = find_projects_section(text)
-    
+    sections['personal'] = index.contact()
+    sections['education'] = index.section('education')
+    sections['work'] = index.section('work')
+    sections['volunteer'] = index.section('volunteer')
+    sections['skills'] = index.section('skills')
+    sections['projects'] = index.section('projects')
+
     return sections
 
 
 def get_contact_info(text: str) -> str:
-    lines = text.split('\n')
- 
-    section_headers = ['EDUCATION', 'EXPERIENCE', 'WORK', 'SKILLS', 'PROJECTS', 'VOLUNTEER']
-    
-    contact_lines = []
-    for i, line in enumerate(lines):
-        line_upper = line.strip().upper()
-        if any(header in line_upper for header in section_headers):
-            break
-        if i >= 10:
-            break
-            
-        contact_lines.append(line)
-    return '\n'.join(contact_lines)
+    return segment_resume(text).contact()
 
 
 def find_education_section(text: str) -> str:
-    headers = ['EDUCATION', 'ACADEMIC', 'SCHOOL']
-    return find_section_with_headers(text, headers)
+    return segment_resume(text).section('education')
 
 
 def find_work_section(text: str) -> str:
-    headers = ['EXPERIENCE', 'WORK', 'EMPLOYMENT', 'PROFESSIONAL']
-    return find_section_with_headers(text, headers)
+    return segment_resume(text).section('work')
 
 
 def find_volunteer_section(text: str) -> str:
-    headers = ['VOLUNTEER', 'COMMUNITY', 'SERVICE']
-    return find_section_with_headers(text, headers)
+    return segment_resume(text).section('volunteer')
 
 
 def find_skills_section(text: str) -> str:
-    headers = ['SKILLS', 'TECHNICAL', 'TECHNOLOGIES']
-    return find_section_with_headers(text, headers)
+    return segment_resume(text).section('skills')
 
 
 def find_projects_section(text: str) -> str:
-    headers = ['PROJECTS', 'PROJECT', 'PORTFOLIO']
-    return find_section_with_headers(text, headers)
-
-
-def find_section_with_headers(text: str, headers: list) -> str:
-    
-    for header in headers:
-        content = get_section_content(text, header)
-        if content:
-            return content
-    
-    return ""
-
-
-def get_section_content(text: str, header: str) -> str:
-    
-    start = re.search(header, text, re.IGNORECASE)
-    if not start:
-        return ""
-    
-    start_pos = start.start()
-    
-    all_headers = ['EDUCATION', 'EXPERIENCE', 'WORK', 'SKILLS', 'PROJECTS', 'VOLUNTEER', 'COMMUNITY']
-    end_pos = len(text)
-    
-    for next_header in all_headers:
-        if next_header.lower() != header.lower():
-            next_section = re.search(next_header, text[start_pos + 10:], re.IGNORECASE)
-            if next_section:
-                new_end = start_pos + 10 + next_section.start()
-                if new_end < end_pos:
-                    end_pos = new_end
-    
-    content = text[start_pos:end_pos].strip()
-    return content
+    return segment_resume(text).section('projects')
 
 
 
@@ -0,0 +1,65 @@
+"""
+Single-flight coalescing of identical in-flight work.
+
+The first caller for a key starts the work in its own task; callers that
+arrive while it runs await the same task instead of repeating it. The task
+belongs to no single request, so a disconnecting leader does not abort the
+work other callers are waiting for. Only when every waiter has gone away is
+the task cancelled.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Result of fn(), shared with every concurrent caller using the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.leaders += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            # shield: cancelling this waiter must not cancel the shared task.
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to receive the result.
+                self._forget(key, flight)
+                flight.task.cancel()
+                self.abandoned += 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        # A newer flight may already own the key once this one was abandoned.
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+
+parse_flight = SingleFlight()
@@ -1,49 +1,157 @@
-import io
-from typing import Optional
+import asyncio
+import mmap
+import zipfile
+from typing import List, Optional, Union
+from xml.etree.ElementTree import ParseError
 
 from pypdf import PdfReader
 from docx import Document
 from fastapi import HTTPException, UploadFile
 
+from app.cache.text import CachedExtraction, text_cache
+from app.config.env_vars import EnvironmentVars
+from app.parser.docx_stream import extract_docx_blocks
+from app.parser.extract_pool import ExtractionTimeout, extraction_pool
+from app.parser.ingest import IngestedFile, ingest_upload
+from app.parser.layout import ExtractedDocument, PdfLineCollector, TextBlock
 
-async def extract_text_from_file(file: UploadFile) -> str:
+# Bump whenever extraction output changes so cached text is invalidated.
+EXTRACTOR_VERSION = "3"
+
+
+async def extract_text_from_file(file: Union[UploadFile, IngestedFile]) -> str:
+    document = await extract_document(file)
+    return document.text
+
+
+async def extract_blocks_from_file(file: Union[UploadFile, IngestedFile]) -> List[TextBlock]:
+    document = await extract_document(file, structured=True)
+    return document.blocks
+
+
+async def extract_document(
+    file: Union[UploadFile, IngestedFile], structured: bool = False
+) -> ExtractedDocument:
+    """Extract text, plus layout blocks when structured is set.
+
+    An already ingested file stays owned by the caller and is not removed.
+    """
+    owned = not isinstance(file, IngestedFile)
+    ingested = await ingest_upload(file) if owned else file
     try:
-        content = await file.read()
-        
-        if file.filename and file.filename.lower().endswith('.pdf'):
-            return _extract_from_pdf(content)
-        elif file.filename and file.filename.lower().endswith('.docx'):
-            return _extract_from_docx(content)
+        mode = f"{ingested.kind}-blocks" if structured else ingested.kind
+        cache_key = text_cache.make_key(EXTRACTOR_VERSION, mode, ingested.digest)
+        cached = await text_cache.get(cache_key)
+        if cached is not None:
+            return _from_cache(cached)
+
+        if ingested.kind == "pdf":
+            document = await _extract_pdf_parallel(ingested.path, structured)
         else:
-            raise HTTPException(
-                status_code=400, 
-                detail="Only PDF and DOCX files"
-            )
-            
+            document = await extraction_pool.run(_extract_from_docx, ingested.path, structured)
+
+        await text_cache.put(cache_key, _to_cache(document))
+        return document
+
+    except ExtractionTimeout as e:
+        raise HTTPException(status_code=422, detail=f"Text extraction failed: {str(e)}")
     except Exception as e:
         if isinstance(e, HTTPException):
             raise
         raise HTTPException(status_code=500, detail=f"Text extraction failed: {str(e)}")
+    finally:
+        if owned:
+            ingested.close()
 
 
-def _extract_from_pdf(content: bytes) -> str:
-    """Extract text from PDF"""
-    reader = PdfReader(io.BytesIO(content))
-    text = ""
-    
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-    
-    return text.strip()
+def _to_cache(document: ExtractedDocument) -> CachedExtraction:
+    blocks = None
+    if document.blocks is not None:
+        blocks = [block.to_dict() for block in document.blocks]
+    return CachedExtraction(text=document.text, blocks=blocks)
 
 
-def _extract_from_docx(content: bytes) -> str:
-    """Extract text from DOCX"""
-    doc = Document(io.BytesIO(content))
+def _from_cache(cached: CachedExtraction) -> ExtractedDocument:
+    blocks = None
+    if cached.blocks is not None:
+        blocks = [TextBlock.from_dict(block) for block in cached.blocks]
+    return ExtractedDocument(text=cached.text, blocks=blocks)
+
+
+async def _extract_pdf_parallel(path: str, structured: bool) -> ExtractedDocument:
+    """Extract PDF pages across pool workers, capped by page count and text budget."""
+    page_count = await extraction_pool.run(_pdf_page_count, path)
+    page_count = min(page_count, EnvironmentVars.EXTRACT_MAX_PAGES)
+    max_chars = EnvironmentVars.EXTRACT_MAX_CHARS
+
+    # One task per page lets idle workers pick up pages as they free up, and
+    # lets pages that are still queued be cancelled once the budget is met.
+    tasks = [
+        asyncio.ensure_future(extraction_pool.run(_extract_pdf_page, path, index, structured))
+        for index in range(page_count)
+    ]
+    pages: List[ExtractedDocument] = []
+    collected = 0
+    try:
+        for task in tasks:
+            page = await task
+            pages.append(page)
+            collected += len(page.text)
+            if collected >= max_chars:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    text = "\n".join(page.text for page in pages).strip()
+    blocks = [block for page in pages for block in page.blocks] if structured else None
+    return ExtractedDocument(text=text, blocks=blocks)
+
+
+# The extractors below run inside extraction_pool workers, so they must stay
+# picklable top-level functions. They receive the spool file path and read it
+# in place rather than having the document bytes pickled across processes.
+def _pdf_page_count(path: str) -> int:
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        return len(PdfReader(content).pages)
+
+
+def _extract_pdf_page(path: str, index: int, structured: bool = False) -> ExtractedDocument:
+    """Extract text (and layout blocks) from one PDF page"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as content:
+        page = PdfReader(content).pages[index]
+        if not structured:
+            return ExtractedDocument(text=page.extract_text() or "")
+
+        collector = PdfLineCollector(page=index + 1)
+        text = page.extract_text(visitor_text=collector) or ""
+        collector.flush()
+        return ExtractedDocument(text=text, blocks=collector.blocks)
+
+
+def _extract_from_docx(path: str, structured: bool = False) -> ExtractedDocument:
+    """Extract text from DOCX, including tables, text boxes, headers and footers"""
+    try:
+        blocks = extract_docx_blocks(path)
+    except (zipfile.BadZipFile, KeyError, ParseError) as e:
+        print(f"Streaming DOCX extraction failed, falling back to python-docx: {e}")
+        text = _extract_from_docx_dom(path)
+        blocks = [TextBlock(text=line, page=1) for line in text.split("\n") if line]
+
+    text = "\n".join(block.text for block in blocks)
+    return ExtractedDocument(text=text, blocks=blocks if structured else None)
+
+
+def _extract_from_docx_dom(path: str) -> str:
+    """Extract body paragraphs from DOCX with python-docx"""
+    # zipfile needs a seekable stream (mmap is not one before 3.13); opening by
+    # path still only reads the package members python-docx asks for.
+    doc = Document(path)
     text = ""
-    
+
     for paragraph in doc.paragraphs:
         if paragraph.text.strip():
             text += paragraph.text + "\n"
-    
-    return text.strip()
\ No newline at end of file
+
+    return text.strip()
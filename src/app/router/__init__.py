@@ -1,11 +1,19 @@
+import asyncio
 import os
+from typing import Awaitable, Callable, Tuple
 
-from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi import APIRouter, File, HTTPException, Query, UploadFile
+from pymongo.errors import DuplicateKeyError
 
+from app.llm.gateway import LLMError
+from app.llm.retry import retry_budget
 from app.model.api import ApiResumeParseRequest, ApiResumeParseResponse
+from app.model.schema.resume.together import Resume
+from app.parser.ingest import IngestedFile, ingest_upload
 from app.parser.pipeline1_gemini import Pipeline1Parser
 from app.parser.pipeline2 import Pipeline2Parser
 from app.parser.pipeline3 import Pipeline3Parser
+from app.parser.singleflight import parse_flight
 
 router = APIRouter(prefix="/resume", tags=["resume"])
 
@@ -15,8 +23,84 @@ pipeline2_parser = Pipeline2Parser()
 pipeline3_parser = Pipeline3Parser()
 
 
+async def _find_stored(pipeline: str, version: str, content_hash: str):
+    return await Resume.find_one(
+        Resume.content_hash == content_hash,
+        Resume.pipeline == pipeline,
+        Resume.pipeline_version == version,
+    )
+
+
+async def _store(resume: Resume, pipeline: str, version: str, content_hash: str, force: bool) -> Resume:
+    """Insert a parse under its dedup key, or overwrite the stored one when forced"""
+    resume.content_hash = content_hash
+    resume.pipeline = pipeline
+    resume.pipeline_version = version
+
+    existing = await _find_stored(pipeline, version, content_hash) if force else None
+    if existing is not None:
+        resume.id = existing.id
+        await resume.replace()
+        return resume
+
+    try:
+        await resume.insert()
+    except DuplicateKeyError:
+        # Another worker process stored the same upload first.
+        return await _find_stored(pipeline, version, content_hash)
+    return resume
+
+
+async def _parse_and_store(
+    pipeline: str,
+    version: str,
+    file: UploadFile,
+    parse: Callable[[IngestedFile], Awaitable[Tuple[Resume, bool]]],
+    force: bool = False,
+) -> Resume:
+    """Return the stored parse of this upload, or parse and store it once.
+
+    parse returns the resume and whether it is worth reusing; fallback resumes
+    from failed parses are stored without a content hash. Concurrent requests
+    for the same pipeline and file content share one parse, and one budget of
+    LLM retries.
+    """
+    ingested = await ingest_upload(file)
+    handed_off = False
+
+    async def work() -> Resume:
+        with retry_budget():
+            resume, reusable = await parse(ingested)
+        if not reusable:
+            await resume.insert()
+            return resume
+        return await _store(resume, pipeline, version, ingested.digest, force)
+
+    def start():
+        # The shared task outlives any single request, so it owns the spool file.
+        nonlocal handed_off
+        handed_off = True
+        task = asyncio.ensure_future(work())
+        task.add_done_callback(lambda _: ingested.close())
+        return task
+
+    try:
+        if not force:
+            stored = await _find_stored(pipeline, version, ingested.digest)
+            if stored is not None:
+                print(f"{pipeline} - Returning stored parse {stored.id}")
+                return stored
+        return await parse_flight.do((pipeline, ingested.digest, force), start)
+    finally:
+        if not handed_off:
+            ingested.close()
+
+
 @router.post("/parse/pipeline1", response_model=ApiResumeParseResponse)
-async def api_resume_parse_pipeline1(file: UploadFile = File(...)):
+async def api_resume_parse_pipeline1(
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Parse again even if this file was already parsed"),
+):
     """Parse resume using Pipeline 1 (Single LLM call)"""
     filename, file_extension = os.path.splitext(file.filename)
     if file_extension.lower() not in [".docx", ".pdf"]:
@@ -25,15 +109,26 @@ async def api_resume_parse_pipeline1(file: UploadFile = File(...)):
             detail="Invalid file type. Only .docx and .pdf files are accepted.",
         )
 
-    result = await pipeline1_parser.parse_resume(file)
-    print(f"Pipeline 1 - Cost: ${result.cost_estimate:.4f}, Tokens: {result.tokens_used}")
-    
-    await result.resume.insert()
-    return ApiResumeParseResponse(resume=result.resume)
+    async def parse(ingested: IngestedFile) -> Tuple[Resume, bool]:
+        try:
+            result = await pipeline1_parser.parse_resume(ingested)
+        except LLMError as e:
+            # Retries are used up; tell the client when the provider expects to recover.
+            headers = {"Retry-After": str(int(e.retry_after + 0.999))} if e.retry_after is not None else None
+            raise HTTPException(status_code=503, detail=f"LLM provider unavailable: {e}", headers=headers)
+        print(f"Pipeline 1 - Cost: ${result.cost_estimate:.4f}, Tokens: {result.tokens_used}, Cache hits: {result.cache_hits}")
+        
+        return result.resume, True
+
+    resume = await _parse_and_store("pipeline1", pipeline1_parser.VERSION, file, parse, force)
+    return ApiResumeParseResponse(resume=resume)
 
 
 @router.post("/parse/pipeline2", response_model=ApiResumeParseResponse)
-async def api_resume_parse_pipeline2(file: UploadFile = File(...)):
+async def api_resume_parse_pipeline2(
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Parse again even if this file was already parsed"),
+):
     """Parse resume using Pipeline 2 (Temperature-optimized multi-stage)"""
     filename, file_extension = os.path.splitext(file.filename)
     if file_extension.lower() not in [".docx", ".pdf"]:
@@ -42,15 +137,22 @@ async def api_resume_parse_pipeline2(file: UploadFile = File(...)):
             detail="Invalid file type. Only .docx and .pdf files are accepted.",
         )
 
-    result = await pipeline2_parser.parse_resume(file)
-    print(f"Pipeline 2 - Cost: ${result.cost_estimate:.4f}, Tokens: {result.tokens_used}")
-    
-    await result.resume.insert()
-    return ApiResumeParseResponse(resume=result.resume)
+    async def parse(ingested: IngestedFile) -> Tuple[Resume, bool]:
+        result = await pipeline2_parser.parse_resume(ingested)
+        print(f"Pipeline 2 - Cost: ${result.cost_estimate:.4f}, Tokens: {result.tokens_used}, Cache hits: {result.cache_hits}, Reused sections: {result.sections_reused}")
+        
+        return result.resume, not result.fallback
+
+    resume = await _parse_and_store("pipeline2", pipeline2_parser.VERSION, file, parse, force)
+    return ApiResumeParseResponse(resume=resume)
 
 
 @router.post("/parse/pipeline3", response_model=ApiResumeParseResponse)
-async def api_resume_parse_pipeline3(file: UploadFile = File(...)):
+async def api_resume_parse_pipeline3(
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Parse again even if this file was already parsed"),
+    hedge: bool = Query(False, description="Start the cloud model too if the local one is slow; first good result wins"),
+):
     """Parse resume using Pipeline 3 (Hybrid Local + Cloud)"""
     filename, file_extension = os.path.splitext(file.filename)
     if file_extension.lower() not in [".docx", ".pdf"]:
@@ -59,15 +161,20 @@ async def api_resume_parse_pipeline3(file: UploadFile = File(...)):
             detail="Invalid file type. Only .docx and .pdf files are accepted.",
         )
 
-    try:
-        result = await pipeline3_parser.parse_resume(file)
-        print(f"Pipeline 3 - Cost: ${result.cost:.4f}, Tokens: {result.tokens_used}")
+    async def parse(ingested: IngestedFile) -> Tuple[Resume, bool]:
+        result = await pipeline3_parser.parse_resume(ingested, hedged=hedge)
+        print(f"Pipeline 3 - Cost: ${result.cost:.4f}, Tokens: {result.tokens_used}, Cache hits: {result.cache_hits}")
         print(f"Pipeline 3 - Method: {result.method_used}, Time: {result.processing_time:.2f}s")
         print(f"Pipeline 3 - Local confidence: {result.local_confidence:.3f}, Cloud confidence: {result.cloud_confidence:.3f}")
         
-        await result.resume.insert()
-        return ApiResumeParseResponse(resume=result.resume)
+        return result.resume, not result.fallback
+
+    try:
+        resume = await _parse_and_store("pipeline3", pipeline3_parser.VERSION, file, parse, force)
+        return ApiResumeParseResponse(resume=resume)
     
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Pipeline 3 error: {e}")
         raise HTTPException(
@@ -77,6 +184,10 @@ async def api_resume_parse_pipeline3(file: UploadFile = File(...)):
 
 
 @router.post("/parse", response_model=ApiResumeParseResponse)
-async def api_resume_parse_default(file: UploadFile = File(...)):
+async def api_resume_parse_default(
+    file: UploadFile = File(...),
+    force: bool = Query(False, description="Parse again even if this file was already parsed"),
+    hedge: bool = Query(False, description="Start the cloud model too if the local one is slow; first good result wins"),
+):
     """Default parse endpoint (uses Pipeline 3 - best accuracy/cost ratio)"""
-    return await api_resume_parse_pipeline3(file)
\ No newline at end of file
+    return await api_resume_parse_pipeline3(file, force, hedge)
\ No newline at end of file
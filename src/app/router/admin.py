@@ -0,0 +1,48 @@
+from fastapi import APIRouter, Query
+
+from app.cache.llm import llm_cache
+from app.cache.section import section_cache
+from app.cache.text import text_cache
+from app.llm.gateway import llm_gateway
+from app.llm.ollama_pool import ollama_pool
+from app.llm.retry import retry_policy
+from app.parser.pipeline3.scheduler import local_scheduler
+from app.parser.singleflight import parse_flight
+from app.router import pipeline3_parser
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/metrics")
+async def api_admin_metrics():
+    """Counters for sizing caches and pools"""
+    return {
+        "text_cache": text_cache.stats(),
+        "llm_cache": llm_cache.stats(),
+        "section_cache": section_cache.stats(),
+        "llm": llm_gateway.stats(),
+        "llm_breakers": llm_gateway.breaker_stats(),
+        "llm_retries": retry_policy.stats(),
+        "parse_single_flight": parse_flight.stats(),
+        "pipeline3_routing": pipeline3_parser.router.stats(),
+        "pipeline3_local": pipeline3_parser.local.stats(),
+        "pipeline3_local_model": pipeline3_parser.keeper.stats(),
+        "pipeline3_local_scheduler": local_scheduler.stats(),
+        "ollama_hosts": ollama_pool.stats(),
+    }
+
+
+@router.delete("/llm-cache")
+async def api_admin_purge_llm_cache(prompt_version: str = Query(...)):
+    """Drop cached LLM responses and section results for a prompt template version, e.g. pipeline1-v1"""
+    return {
+        "prompt_version": prompt_version,
+        "purged": await llm_cache.purge(prompt_version),
+        "purged_sections": await section_cache.purge(prompt_version),
+    }
+
+
+@router.post("/pipeline3/routing/reload")
+async def api_admin_reload_pipeline3_routing():
+    """Re-read the Pipeline 3 cascade thresholds now instead of on the next parse"""
+    return pipeline3_parser.router.reload()
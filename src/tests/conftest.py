@@ -0,0 +1,5 @@
+import os
+
+# app.config.env_vars reads these at import time.
+os.environ.setdefault("DB_PORT", "27017")
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,64 @@
+import json
+
+import pytest
+
+from app.parser.pipeline3.json_stream import IncrementalJSONValidator, JSONRepetitionError, JSONStreamError
+
+
+def feed(text: str, chunk_size: int = 7) -> IncrementalJSONValidator:
+    validator = IncrementalJSONValidator()
+    for i in range(0, len(text), chunk_size):
+        validator.feed(text[i:i + chunk_size])
+    return validator
+
+
+def project(name: str, bullet: str) -> dict:
+    return {
+        "organization": None,
+        "role": name,
+        "type": "project",
+        "location": {"city": None, "state": None, "zip_code": None},
+        "start_date": None,
+        "end_date": None,
+        "is_current": False,
+        "bullets": [bullet],
+    }
+
+
+def test_projects_sharing_null_fields_are_not_a_loop():
+    resume = {
+        "personal_info": {"name": "Jane Smith"},
+        "experience_items": [
+            project("Chess Engine", "Wrote a chess engine in Rust"),
+            project("Resume Parser", "Parsed resumes with a local model"),
+            project("Blog", "Static site generator"),
+            project("Discord Bot", "Moderation bot for a study group"),
+            project("Pong", "Pong clone in C"),
+        ],
+    }
+    text = json.dumps(resume, indent=2)
+
+    validator = feed(text)
+
+    assert validator.done
+    assert json.loads(validator.text) == resume
+
+
+def test_back_to_back_repeats_are_a_loop():
+    item = '{"role": "Engineer", "bullets": ["Built the same thing again and again"]}, '
+    text = '{"experience_items": [' + item * 10
+
+    with pytest.raises(JSONRepetitionError):
+        feed(text)
+
+
+def test_invalid_json_is_rejected_early():
+    with pytest.raises(JSONStreamError):
+        feed('{"name": "Jane", "skills": [}')
+
+
+def test_preamble_before_object_is_skipped():
+    validator = feed('Here is the JSON:\n{"name": "Jane"} trailing')
+
+    assert validator.done
+    assert validator.text == '{"name": "Jane"}'